@@ -0,0 +1,126 @@
+import glob
+import json
+import os
+import threading
+import pandas as pd
+import streamlit as st
+from conversation_log import ConversationLog, LOG_DIR
+
+# Analytics settings, overridable from the [analytics] secrets section
+ANALYTICS_SETTINGS = st.secrets.get("analytics", {})
+HISTORY_DIR = ANALYTICS_SETTINGS.get("history_dir", "data")
+STATE_DIR = ANALYTICS_SETTINGS.get("state_dir", "analytics_state")
+
+QUERY_COLUMNS = ["timestamp", "query"]
+SCHOOL_COLUMNS = ["timestamp", "school", "kind", "graduation_year"]
+
+# Function to flatten one conversation record into query and school rows
+def flatten_record(record, queries, schools):
+    timestamp = record.get("timestamp")
+    queries.append((timestamp, record.get("query")))
+
+    relevant = record.get("relevant_schools") or record.get("results") or []
+    for school in relevant:
+        if isinstance(school, str) and school.strip():
+            schools.append((timestamp, school.strip(), "relevant", None))
+
+    form_data = record.get("form_data") or {}
+    interested = form_data.get("interested_schools") or form_data.get("selected_schools") or []
+    for school in interested:
+        if isinstance(school, str) and school.strip():
+            schools.append((timestamp, school.strip(), "interested", form_data.get("graduation_year")))
+
+class ConversationAnalytics:
+    def __init__(self, history_dir=HISTORY_DIR, log_dir=LOG_DIR, state_dir=STATE_DIR):
+        self.history_dir = history_dir
+        self.log_dir = log_dir
+        self.state_dir = state_dir
+        os.makedirs(state_dir, exist_ok=True)
+        self.lock = threading.Lock()
+        self.checkpoint_path = os.path.join(state_dir, "checkpoint.json")
+        self.queries_path = os.path.join(state_dir, "queries.parquet")
+        self.schools_path = os.path.join(state_dir, "schools.parquet")
+        self.checkpoint = self.read_checkpoint()
+        self.queries = self.read_table(self.queries_path, QUERY_COLUMNS)
+        self.schools = self.read_table(self.schools_path, SCHOOL_COLUMNS)
+
+    # Function to read which files and segment offsets were already ingested
+    def read_checkpoint(self):
+        if os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path) as f:
+                return json.load(f)
+        return {"files": [], "segments": {}}
+
+    # Function to read a stored table, or an empty one on the first run
+    def read_table(self, path, columns):
+        if os.path.exists(path):
+            return pd.read_parquet(path)
+        return pd.DataFrame({column: pd.Series(dtype="object") for column in columns})
+
+    # Function to ingest new records, one refresh at a time since every dashboard viewer shares this engine
+    def refresh(self):
+        with self.lock:
+            return self.ingest()
+
+    # Function to ingest only the files and log lines added since the last checkpoint
+    def ingest(self):
+        queries, schools = [], []
+        seen_files = set(self.checkpoint["files"])
+        new_files = sorted(
+            os.path.basename(path) for path in glob.glob(os.path.join(self.history_dir, "conversation_*.json"))
+            if os.path.basename(path) not in seen_files
+        )
+        for name in new_files:
+            try:
+                with open(os.path.join(self.history_dir, name)) as f:
+                    flatten_record(json.load(f), queries, schools)
+            except (OSError, ValueError):
+                continue
+
+        segment_offsets = dict(self.checkpoint["segments"])
+        if os.path.isdir(self.log_dir):
+            log = ConversationLog(self.log_dir)
+            for path in log.segments():
+                name = os.path.basename(path)
+                offset = segment_offsets.get(name, 0)
+                for offset, record in log.read_segment(path, offset):
+                    flatten_record(record, queries, schools)
+                segment_offsets[name] = offset
+
+        if not queries and not schools:
+            return 0
+
+        new_queries = pd.DataFrame(queries, columns=QUERY_COLUMNS)
+        new_schools = pd.DataFrame(schools, columns=SCHOOL_COLUMNS)
+        for frame in (new_queries, new_schools):
+            frame["timestamp"] = pd.to_datetime(frame["timestamp"], errors="coerce")
+        new_schools["graduation_year"] = pd.to_numeric(new_schools["graduation_year"], errors="coerce")
+
+        self.queries = pd.concat([self.queries, new_queries], ignore_index=True) if len(self.queries) else new_queries
+        self.schools = pd.concat([self.schools, new_schools], ignore_index=True) if len(self.schools) else new_schools
+        self.queries.to_parquet(self.queries_path, index=False)
+        self.schools.to_parquet(self.schools_path, index=False)
+
+        # The checkpoint is written last, so a crash in between re-reads those records rather than losing them
+        self.checkpoint = {"files": sorted(seen_files.union(new_files)), "segments": segment_offsets}
+        with open(self.checkpoint_path, "w") as f:
+            json.dump(self.checkpoint, f)
+        return len(new_queries)
+
+    # Function to count how often each school appeared in the bot's answers
+    def top_relevant_schools(self, n=20):
+        relevant = self.schools[self.schools["kind"] == "relevant"]
+        return relevant["school"].value_counts().head(n)
+
+    # Function to count the most common queries, ignoring case and surrounding whitespace
+    def top_queries(self, n=20):
+        return self.queries["query"].dropna().str.strip().str.lower().value_counts().head(n)
+
+    # Function to count interested schools per high school graduation year
+    def interested_by_graduation_year(self):
+        interested = self.schools[self.schools["kind"] == "interested"]
+        return interested.groupby(["graduation_year", "school"]).size().rename("count").reset_index()
+
+    # Function to count queries per period, daily by default
+    def query_volume(self, freq="D"):
+        return self.queries.dropna(subset=["timestamp"]).set_index("timestamp").resample(freq).size()
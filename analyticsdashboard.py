@@ -0,0 +1,26 @@
+import streamlit as st
+from analytics import ConversationAnalytics
+
+# Function to keep one analytics engine per process so each refresh only reads new records
+@st.cache_resource(show_spinner=False)
+def get_analytics():
+    return ConversationAnalytics()
+
+# Streamlit app UI
+st.title('College Chat Analytics')
+
+analytics = get_analytics()
+new_records = analytics.refresh()
+st.caption(f"{len(analytics.queries)} conversations, {new_records} new since the last refresh")
+
+st.subheader("Most requested schools")
+st.bar_chart(analytics.top_relevant_schools())
+
+st.subheader("Most common queries")
+st.dataframe(analytics.top_queries())
+
+st.subheader("Interested schools by graduation year")
+st.dataframe(analytics.interested_by_graduation_year())
+
+st.subheader("Query volume")
+st.line_chart(analytics.query_volume())
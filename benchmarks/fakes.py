@@ -0,0 +1,245 @@
+import functools
+import glob
+import json
+import os
+import re
+import time
+from collections import defaultdict
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Injected latency in seconds per call, set by the benchmark runner
+LATENCY = {"gemini": 0.0, "scorecard": 0.0, "ipeds": 0.0, "github": 0.0}
+# Time spent inside each fake service, reset between reruns
+SERVICE_TIME = defaultdict(float)
+SERVICE_CALLS = defaultdict(int)
+
+# Function to sleep for a service's injected latency and record the call
+def simulate(service, started):
+    time.sleep(LATENCY[service])
+    SERVICE_CALLS[service] += 1
+    SERVICE_TIME[service] += time.perf_counter() - started
+
+# Function to collect the stored conversations the fakes answer from
+def stored_conversations():
+    records = []
+    for path in sorted(glob.glob(os.path.join(REPO_DIR, "data", "conversation_*.json"))):
+        with open(path) as f:
+            records.append(json.load(f))
+    return records
+
+# Function to build a deterministic IPEDS HD fixture from the rows saved with past conversations
+def ipeds_fixture():
+    import pandas as pd
+    rows = {}
+    for record in stored_conversations():
+        for key in ("filtered_ipeds_data", "ipeds_data"):
+            for row in record.get(key) or []:
+                if isinstance(row, dict) and "unitid" in row:
+                    rows[row["unitid"]] = row
+    df = pd.DataFrame(sorted(rows.values(), key=lambda row: row["unitid"]))
+    df["unitid"] = df["unitid"].astype(int)
+    return df
+
+# Function to list (name without campus, city, state) for every institution in the IPEDS fixture
+@functools.lru_cache(maxsize=1)
+def fixture_locations():
+    df = ipeds_fixture()
+    return [(name.split("-")[0], city, state) for name, city, state in zip(df["instnm"], df["city"], df["stabbr"])]
+
+# Function to give the city and state of an institution named in an answer, as a model that knows it would
+def fake_location(name):
+    known = [location for location in fixture_locations() if location[0] in name]
+    if not known:
+        return {}
+    _, city, state = max(known, key=lambda location: len(location[0]))
+    return {"city": city, "state": state}
+
+# Function to write a small College Scorecard bulk CSV, in the published layout, from the IPEDS fixture
+def write_scorecard_csv(path):
+    df = ipeds_fixture()
+    csv = df.rename(columns={"unitid": "UNITID", "instnm": "INSTNM", "city": "CITY", "stabbr": "STABBR"})
+    csv = csv[["UNITID", "INSTNM", "CITY", "STABBR"]].assign(
+        INSTURL=df["webaddr"],
+        ADM_RATE="NULL", TUITIONFEE_IN="PrivacySuppressed", TUITIONFEE_OUT="NULL", UGDS="NULL", OPEID="NULL",
+    )
+    csv.to_csv(path, index=False)
+    return path
+
+DEFAULT_ANSWER = (
+    "Here are some options:\n"
+    "* **Yale University**\n* **Quinnipiac University**\n* **Sacred Heart University**\n"
+    "* **New York University**\n* **Columbia University**\n* **Asnuntuck Community College**\n"
+)
+
+# Stand-in for a Gemini response, iterable like a streamed one
+class FakeResponse:
+    def __init__(self, text, fragment_size=40):
+        self.text = text
+        self.fragment_size = fragment_size
+
+    def __iter__(self):
+        for i in range(0, len(self.text), self.fragment_size):
+            yield FakeResponse(self.text[i:i + self.fragment_size])
+
+class FakeChat:
+    def __init__(self, answers):
+        self.answers = answers
+
+    def send_message(self, content, stream=False, **kwargs):
+        started = time.perf_counter()
+        simulate("gemini", started)
+        return FakeResponse(self.answers.get(content.strip().lower(), DEFAULT_ANSWER))
+
+class FakeGenerativeModel:
+    answers = None
+
+    def __init__(self, model_name=None, **kwargs):
+        if FakeGenerativeModel.answers is None:
+            FakeGenerativeModel.answers = {
+                record["query"].strip().lower(): record.get("response") or record.get("response_text")
+                for record in stored_conversations()
+                if record.get("query") and isinstance(record.get("response") or record.get("response_text"), str)
+            }
+
+    def start_chat(self, history=None):
+        return FakeChat(self.answers)
+
+    def generate_content(self, content, stream=False, generation_config=None, **kwargs):
+        json_mode = (generation_config or {}).get("response_mime_type") == "application/json"
+        if not json_mode and "Reply with JSON only" not in content:
+            return FakeChat(self.answers).send_message(content, stream=stream)
+
+        # A JSON answer wraps the stored answer and lists its bolded institution names
+        question = content.rsplit("Question: ", 1)[-1]
+        answer = FakeChat(self.answers).send_message(question).text
+        names = dict.fromkeys(name.strip() for name in re.findall(r"\*\*([^*\n]+?)\*\*", answer)
+                              if re.search(r"University|College|Institute", name))
+        raw = json.dumps({"answer": answer, "institutions": [{"name": name, **fake_location(name)} for name in names]})
+        # Without JSON mode the model is only prompted for JSON, and fences it like any other code
+        return FakeResponse(raw if json_mode else f"```json\n{raw}\n```")
+
+# Stand-in for a requests response from the College Scorecard API
+class FakeHTTPResponse:
+    status_code = 200
+
+    def __init__(self, payload):
+        self.payload = payload
+
+    def json(self):
+        return self.payload
+
+    def raise_for_status(self):
+        pass
+
+# Function to answer a Scorecard query from the IPEDS fixture
+def fake_scorecard_get(url, params=None, **kwargs):
+    started = time.perf_counter()
+    params = params or {}
+    df = ipeds_fixture()
+    if params.get("school.state"):
+        df = df[df["stabbr"] == params["school.state"]]
+    if params.get("school.name"):
+        df = df[df["instnm"].str.contains(params["school.name"], case=False, regex=False)]
+    if params.get("id"):
+        ids = {int(unitid) for unitid in str(params["id"]).split(",")}
+        df = df[df["unitid"].isin(ids)]
+    per_page = int(params.get("per_page", 20))
+    page = int(params.get("page", 0))
+    results = [
+        {"id": int(row.unitid), "school.name": row.instnm, "school.city": row.city, "school.state": row.stabbr,
+         "latest.admissions.admission_rate.overall": None}
+        for row in df.iloc[page * per_page:(page + 1) * per_page].itertuples()
+    ]
+    simulate("scorecard", started)
+    return FakeHTTPResponse({"metadata": {"total": len(df), "page": page, "per_page": per_page}, "results": results})
+
+# Stand-in for pypeds' HD survey
+class FakeHD:
+    def __init__(self, years=None):
+        self.years = years
+        self.df = None
+
+    def extract(self):
+        started = time.perf_counter()
+        self.df = ipeds_fixture()
+        simulate("ipeds", started)
+
+    def load(self):
+        return self.df
+
+class FakeObject:
+    def __init__(self, **attributes):
+        self.__dict__.update(attributes)
+
+class FakeContentFile:
+    def __init__(self, path, content, sha):
+        self.path = path
+        self.decoded_content = content.encode()
+        self.sha = sha
+
+    def update(self):
+        started = time.perf_counter()
+        simulate("github", started)
+        return False
+
+# Stand-in for the PyGithub repository, covering the calls the apps make
+class FakeRepo:
+    default_branch = "main"
+
+    def __init__(self):
+        self.files = {}
+        self.commits = 0
+
+    def get_contents(self, path):
+        from github import UnknownObjectException
+        started = time.perf_counter()
+        simulate("github", started)
+        if path not in self.files and not any(name.startswith(path + "/") for name in self.files):
+            raise UnknownObjectException(404, {"message": "Not Found"}, {})
+        return self.files.get(path) or [file for name, file in self.files.items() if name.startswith(path + "/")]
+
+    def create_file(self, path, message, content, sha=None):
+        started = time.perf_counter()
+        self.commits += 1
+        self.files[path] = FakeContentFile(path, content, f"sha{self.commits}")
+        simulate("github", started)
+        return {"content": self.files[path], "commit": FakeObject(sha=f"commit{self.commits}")}
+
+    def update_file(self, path, message, content, sha):
+        return self.create_file(path, message, content)
+
+    def get_git_ref(self, ref):
+        started = time.perf_counter()
+        simulate("github", started)
+        return FakeObject(object=FakeObject(sha=f"commit{self.commits}"), edit=lambda sha: None)
+
+    def get_git_commit(self, sha):
+        return FakeObject(sha=sha, tree=FakeObject(sha="tree"))
+
+    def create_git_tree(self, elements, base_tree=None):
+        started = time.perf_counter()
+        simulate("github", started)
+        return FakeObject(sha="tree", elements=elements)
+
+    def create_git_commit(self, message, tree, parents):
+        started = time.perf_counter()
+        self.commits += 1
+        simulate("github", started)
+        return FakeObject(sha=f"commit{self.commits}")
+
+FAKE_REPO = FakeRepo()
+
+# Function to swap every live service for its local fake
+def install():
+    import requests
+    import github
+    import google.generativeai as genai
+    from pypeds import ipeds
+
+    genai.configure = lambda **kwargs: None
+    genai.GenerativeModel = FakeGenerativeModel
+    requests.get = fake_scorecard_get
+    requests.Session.get = lambda self, url, params=None, **kwargs: fake_scorecard_get(url, params, **kwargs)
+    ipeds.HD = FakeHD
+    github.Github.get_repo = lambda self, name, *args, **kwargs: FAKE_REPO
@@ -0,0 +1,191 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+
+SECRETS = """
+[google_gen_ai]
+api_key = "benchmark"
+stream = {stream}
+structured_output = {structured}
+[college_scorecard]
+api_key = "benchmark"
+[github]
+token = "benchmark"
+[storage]
+backend = "{storage}"
+[response_cache]
+enabled = {caches}
+[semantic_cache]
+enabled = {caches}
+[scorecard_cache]
+enabled = {caches}
+[scorecard_mirror]
+enabled = {mirror}
+"""
+
+# Function to copy the per-stage totals the metrics module has collected so far
+def stage_totals():
+    import metrics
+    with metrics.lock:
+        return {stage: stats["sum"] for stage, stats in metrics.stage_seconds.items()}
+
+# Function to run one AppTest step and collect its end-to-end and per-stage timings
+def measure(results, app, step, action):
+    import fakes
+    fakes.SERVICE_TIME.clear()
+    fakes.SERVICE_CALLS.clear()
+    before = stage_totals()
+    started = time.perf_counter()
+    at = action()
+    elapsed = time.perf_counter() - started
+    stages = {stage: seconds - before.get(stage, 0.0) for stage, seconds in stage_totals().items()}
+    errors = [exception.value for exception in at.exception] if at is not None else []
+    results.append({
+        "app": app,
+        "step": step,
+        "total_ms": elapsed * 1000,
+        "stages_ms": {stage: seconds * 1000 for stage, seconds in stages.items() if seconds > 0},
+        "services_ms": {service: seconds * 1000 for service, seconds in fakes.SERVICE_TIME.items()},
+        "service_calls": dict(fakes.SERVICE_CALLS),
+        "errors": errors,
+    })
+    return at
+
+# Function to drive collegechat.py through a query, a selection and a form submit
+def bench_collegechat(results, query, timeout):
+    from streamlit.testing.v1 import AppTest
+    at = AppTest.from_file(os.path.join(REPO_DIR, "collegechat.py"), default_timeout=timeout)
+    measure(results, "collegechat", "first render", at.run)
+
+    def ask():
+        at.text_input[0].input(query)
+        at.button[0].click()
+        return at.run()
+    measure(results, "collegechat", "ask", ask)
+
+    # The school checkboxes live in the details form, so picking every school costs one submit
+    def select_and_submit():
+        for checkbox in at.checkbox:
+            checkbox.check()
+        return at.button[-1].click().run()
+    measure(results, "collegechat", "select and submit", select_and_submit)
+
+# Function to drive cxchatwli.py through sign up, a query and a selection
+def bench_cxchatwli(results, query, timeout):
+    from streamlit.testing.v1 import AppTest
+    at = AppTest.from_file(os.path.join(REPO_DIR, "cxchatwli.py"), default_timeout=timeout)
+    measure(results, "cxchatwli", "login screen", at.run)
+    at.selectbox[0].select("Sign Up").run()
+
+    def sign_up():
+        at.text_input[0].input(f"bench{int(time.time() * 1000)}")
+        at.text_input[1].input("benchmark")
+        at.button[0].click()
+        return at.run()
+    measure(results, "cxchatwli", "sign up", sign_up)
+    measure(results, "cxchatwli", "main app", at.run)
+
+    def ask():
+        at.text_input[0].input(query)
+        at.button[1].click()
+        return at.run()
+    measure(results, "cxchatwli", "ask", ask)
+
+    def select_and_save():
+        for checkbox in at.checkbox:
+            checkbox.check()
+        return at.button[-1].click().run()
+    measure(results, "cxchatwli", "select and save", select_and_save)
+
+# Function to drive ipedsapi.py through one query
+def bench_ipedsapi(results, query, timeout):
+    from streamlit.testing.v1 import AppTest
+    at = AppTest.from_file(os.path.join(REPO_DIR, "ipedsapi.py"), default_timeout=timeout)
+    measure(results, "ipedsapi", "first render", at.run)
+
+    def ask():
+        at.text_input[0].input(query)
+        at.button[0].click()
+        return at.run()
+    measure(results, "ipedsapi", "ask", ask)
+
+# Function to time the Scorecard lookup and the batched GitHub flush outside of a rerun
+def bench_services(results):
+    import storage
+    from scorecard import fetch_college_data
+
+    measure(results, "services", "fetch_college_data", lambda: fetch_college_data("NY", "University") and None)
+
+    backend = storage.get_storage()
+    if hasattr(backend, "save_conversation") and type(backend).__name__ == "GitHubStorage":
+        from github_store import get_conversation_writer
+        measure(results, "services", "github flush", lambda: get_conversation_writer().flush())
+
+# Function to print the results as a table
+def report(results):
+    print(f"{'app':<12} {'step':<20} {'total ms':>10}  stages / services (ms)")
+    for result in results:
+        parts = [f"{stage}={ms:.1f}" for stage, ms in sorted(result["stages_ms"].items())]
+        parts += [f"[{service}]={ms:.1f}x{result['service_calls'][service]}" for service, ms in sorted(result["services_ms"].items())]
+        print(f"{result['app']:<12} {result['step']:<20} {result['total_ms']:>10.1f}  {' '.join(parts)}")
+        for error in result["errors"]:
+            print(f"{'':<34}error: {error}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the chat apps against local stand-in services")
+    parser.add_argument("--apps", nargs="+", default=["collegechat", "cxchatwli", "ipedsapi", "services"])
+    parser.add_argument("--query", default="graduate business programs in New York")
+    parser.add_argument("--gemini-latency", type=float, default=0.5)
+    parser.add_argument("--scorecard-latency", type=float, default=0.2)
+    parser.add_argument("--ipeds-latency", type=float, default=2.0)
+    parser.add_argument("--github-latency", type=float, default=0.3)
+    parser.add_argument("--storage", default="github", choices=["github", "sqlite", "log"])
+    parser.add_argument("--stream", action="store_true", help="render Gemini answers as a stream")
+    parser.add_argument("--structured", action="store_true", help="ask Gemini for JSON answers listing the schools")
+    parser.add_argument("--caches", action="store_true", help="keep the Gemini and Scorecard caches on")
+    parser.add_argument("--scorecard-mirror", action="store_true", help="answer Scorecard lookups from a local mirror")
+    parser.add_argument("--repeat", type=int, default=1, help="run every scenario this many times")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--json", help="also write the raw results to this file")
+    args = parser.parse_args()
+    json_path = os.path.abspath(args.json) if args.json else None
+
+    # Secrets are read from the working directory, so every run gets a scratch one
+    workdir = tempfile.mkdtemp(prefix="collegechat-bench-")
+    os.makedirs(os.path.join(workdir, ".streamlit"))
+    with open(os.path.join(workdir, ".streamlit", "secrets.toml"), "w") as f:
+        f.write(SECRETS.format(stream=str(args.stream).lower(), storage=args.storage, caches=str(args.caches).lower(),
+                               mirror=str(args.scorecard_mirror).lower(), structured=str(args.structured).lower()))
+    os.chdir(workdir)
+    sys.path[:0] = [REPO_DIR, BENCH_DIR]
+
+    import fakes
+    if args.scorecard_mirror:
+        from scorecard_mirror import ingest_csv
+        ingest_csv(fakes.write_scorecard_csv(os.path.join(workdir, "scorecard.csv")))
+    fakes.LATENCY.update(gemini=args.gemini_latency, scorecard=args.scorecard_latency,
+                         ipeds=args.ipeds_latency, github=args.github_latency)
+    fakes.install()
+
+    scenarios = {"collegechat": bench_collegechat, "cxchatwli": bench_cxchatwli, "ipedsapi": bench_ipedsapi}
+    results = []
+    for _ in range(args.repeat):
+        for app in args.apps:
+            if app == "services":
+                bench_services(results)
+            else:
+                scenarios[app](results, args.query, args.timeout)
+
+    report(results)
+    if json_path:
+        with open(json_path, "w") as f:
+            json.dump(results, f, indent=4)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from run_benchmarks import BENCH_DIR, REPO_DIR, SECRETS
+
+# Repository modules whose own import cost is reported, in dependency order
+MODULES = [
+    "lazy_imports", "metrics", "phrase_automaton", "moderation", "response_cache", "semantic_cache",
+    "gemini_client", "storage", "sqlite_store", "github_store", "conversation_log", "ipeds_snapshot",
+    "school_matcher", "school_selection", "scorecard_cache", "scorecard_mirror", "scorecard", "analytics",
+]
+# Third-party packages worth deferring, reported when a module or first render pulls them in
+HEAVY = ["google.generativeai", "github", "requests", "pandas", "numpy", "pyarrow", "pypeds", "rapidfuzz", "bcrypt"]
+
+# Renders one app in a fresh interpreter and prints its first-render time and the heavy packages it imported
+RENDER_SCRIPT = """
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+before = set(sys.modules)
+started = time.perf_counter()
+at = AppTest.from_file({path!r}, default_timeout={timeout}).run()
+elapsed = time.perf_counter() - started
+print(json.dumps({{
+    "first_render_ms": elapsed * 1000,
+    "imported": [name for name in {heavy!r} if name in sys.modules and name not in before],
+    "errors": [str(exception.value) for exception in at.exception],
+}}))
+"""
+
+# Function to parse `python -X importtime` output into cumulative microseconds per module
+def parse_importtime(stderr):
+    cumulative = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line.split("|", 2)
+        cumulative[name.strip()] = int(cumulative_us)
+    return cumulative
+
+# Function to run a snippet in a fresh interpreter from the scratch working directory
+def run_fresh(code, workdir, importtime=False):
+    args = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", code]
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([REPO_DIR, BENCH_DIR, os.environ.get("PYTHONPATH", "")]))
+    return subprocess.run(args, cwd=workdir, env=env, capture_output=True, text=True)
+
+# Function to measure the cold import cost of one repository module, on top of Streamlit itself
+def measure_module(module, workdir):
+    # The first st.secrets read parses secrets.toml once per process, so it is paid before timing the module
+    completed = run_fresh(f"import streamlit\nstreamlit.secrets.get('')\nimport {module}", workdir, importtime=True)
+    times = parse_importtime(completed.stderr)
+    return {
+        "module": module,
+        "import_ms": times.get(module, 0) / 1000,
+        "heavy_ms": {name: times[name] / 1000 for name in HEAVY if name in times},
+        "error": completed.stderr.strip().splitlines()[-1] if completed.returncode else None,
+    }
+
+# Function to measure the first render of one app in a fresh interpreter
+def measure_app(app, workdir, timeout):
+    script = RENDER_SCRIPT.format(path=os.path.join(REPO_DIR, f"{app}.py"), timeout=timeout, heavy=HEAVY)
+    completed = run_fresh(script, workdir)
+    if completed.returncode:
+        return {"app": app, "first_render_ms": None, "imported": [], "errors": [completed.stderr.strip()[-500:]]}
+    return {"app": app, **json.loads(completed.stdout.strip().splitlines()[-1])}
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold import and first-render time of the apps")
+    parser.add_argument("--apps", nargs="+", default=["collegechat", "cxchatwli", "ipedsapi"])
+    parser.add_argument("--modules", nargs="+", default=MODULES)
+    parser.add_argument("--repeat", type=int, default=3, help="fresh processes per app; the fastest is reported")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--json", help="also write the raw results to this file")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="collegechat-startup-")
+    os.makedirs(os.path.join(workdir, ".streamlit"))
+    with open(os.path.join(workdir, ".streamlit", "secrets.toml"), "w") as f:
+        f.write(SECRETS.format(stream="true", storage="sqlite", caches="false", mirror="false", structured="false"))
+
+    modules = [measure_module(module, workdir) for module in args.modules]
+    print(f"{'module':<20} {'import ms':>10}  heavy packages loaded (cumulative ms)")
+    for result in modules:
+        heavy = " ".join(f"{name}={ms:.0f}" for name, ms in result["heavy_ms"].items())
+        print(f"{result['module']:<20} {result['import_ms']:>10.1f}  {result['error'] or heavy}")
+
+    apps = []
+    for app in args.apps:
+        runs = [measure_app(app, workdir, args.timeout) for _ in range(args.repeat)]
+        timed_runs = [run for run in runs if run["first_render_ms"] is not None]
+        apps.append(min(timed_runs, key=lambda run: run["first_render_ms"]) if timed_runs else runs[0])
+    print(f"\n{'app':<20} {'first render ms':>15}  heavy packages imported by the render")
+    for result in apps:
+        render_ms = f"{result['first_render_ms']:.1f}" if result["first_render_ms"] is not None else "failed"
+        print(f"{result['app']:<20} {render_ms:>15}  {' '.join(result['imported']) or '-'}")
+        for error in result["errors"]:
+            print(f"{'':<38}error: {error}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"modules": modules, "apps": apps}, f, indent=4)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+import argparse
+from bisect import bisect_left
+import fcntl
+import glob
+import json
+import os
+import re
+import threading
+import time
+import streamlit as st
+from sqlite_store import SQLiteStorage
+
+# Conversation log settings, overridable from the [conversation_log] secrets section
+LOG_SETTINGS = st.secrets.get("conversation_log", {})
+LOG_DIR = LOG_SETTINGS.get("directory", "conversation_log")
+MAX_SEGMENT_BYTES = LOG_SETTINGS.get("max_segment_bytes", 8 * 1024 * 1024)
+MAX_SEGMENT_SECONDS = LOG_SETTINGS.get("max_segment_seconds", 24 * 3600)
+SEGMENT_NAME = re.compile(r"segment_(\d{8})_(\d+)\.jsonl$")
+# Source files already copied into the log by migrate_json_files
+MIGRATED_MANIFEST = "migrated_files.txt"
+
+# Function to get the offset index file that sits next to a segment
+def index_path(segment_path):
+    return segment_path[:-len(".jsonl")] + ".idx"
+
+# Function to read a segment's index as (byte offset, timestamp) pairs
+def read_index(segment_path):
+    entries = []
+    path = index_path(segment_path)
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                offset, _, timestamp = line.rstrip("\n").partition("\t")
+                entries.append((int(offset), timestamp))
+    return entries
+
+class ConversationLog:
+    def __init__(self, directory=LOG_DIR, max_segment_bytes=MAX_SEGMENT_BYTES, max_segment_seconds=MAX_SEGMENT_SECONDS):
+        self.directory = directory
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segment_seconds = max_segment_seconds
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    # Function to list segment paths, oldest first
+    def segments(self):
+        paths = glob.glob(os.path.join(self.directory, "segment_*.jsonl"))
+        return sorted(path for path in paths if SEGMENT_NAME.search(path))
+
+    # Function to pick the segment to append to, rolling over on size or age
+    def active_segment(self, incoming_bytes):
+        segments = self.segments()
+        if segments:
+            path = segments[-1]
+            sequence, started = (int(part) for part in SEGMENT_NAME.search(path).groups())
+            too_big = os.path.getsize(path) + incoming_bytes > self.max_segment_bytes
+            too_old = time.time() - started > self.max_segment_seconds
+            if not too_big and not too_old:
+                return path
+            sequence += 1
+        else:
+            sequence = 0
+        return os.path.join(self.directory, f"segment_{sequence:08d}_{int(time.time())}.jsonl")
+
+    # Function to append one record as a single line and index its offset
+    def append(self, record):
+        line = (json.dumps(record, separators=(",", ":")) + "\n").encode()
+        with self.lock:
+            path = self.active_segment(len(line))
+            with open(path, "ab") as f:
+                # The file lock keeps appends from several app processes from interleaving
+                fcntl.flock(f, fcntl.LOCK_EX)
+                offset = f.seek(0, os.SEEK_END)
+                f.write(line)
+                f.flush()
+                with open(index_path(path), "a") as index:
+                    index.write(f"{offset}\t{record.get('timestamp', '')}\n")
+
+    # Function to read a segment sequentially from a byte offset, yielding (next offset, record)
+    def read_segment(self, path, offset=0):
+        with open(path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                offset += len(line)
+                # A line without its newline is still being written by another process
+                if not line.endswith(b"\n"):
+                    break
+                yield offset, json.loads(line)
+
+    # Function to iterate over all records, using the indexes to skip those older than since
+    def iter_records(self, since=None):
+        for path in self.segments():
+            offset = 0
+            if since is not None:
+                index = read_index(path)
+                position = bisect_left([timestamp for _, timestamp in index], since)
+                if position == len(index):
+                    continue
+                offset = index[position][0]
+            for _, record in self.read_segment(path, offset):
+                yield record
+
+class LogStorage(SQLiteStorage):
+    # Conversations go to the segmented log, profiles stay in SQLite
+    def __init__(self, sqlite_path, log_directory=LOG_DIR):
+        super().__init__(sqlite_path)
+        self.log = ConversationLog(log_directory)
+
+    # Function to append a conversation record to the log
+    def save_conversation(self, history):
+        self.log.append(history)
+
+    # Function to read conversation records, optionally for one user or time range
+    def load_conversations(self, username=None, since=None, until=None):
+        records = []
+        for record in self.log.iter_records(since):
+            if until is not None and record.get("timestamp", "") >= until:
+                continue
+            if username is not None and (record.get("form_data") or {}).get("username") != username:
+                continue
+            records.append(record)
+        return records
+
+# Function to copy per-record conversation JSON files into the segmented log, oldest first
+# Migrated file names are listed next to the segments, so running it again only copies files added since
+def migrate_json_files(source_dir, log):
+    manifest_path = os.path.join(log.directory, MIGRATED_MANIFEST)
+    migrated = set()
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            migrated = {line.rstrip("\n") for line in f}
+    records = []
+    for path in glob.glob(os.path.join(source_dir, "conversation_*.json")):
+        name = os.path.basename(path)
+        if name in migrated:
+            continue
+        with open(path) as f:
+            record = json.load(f)
+        records.append((record.get("timestamp") or name, name, record))
+    records.sort(key=lambda item: item[0])
+    with open(manifest_path, "a") as manifest:
+        for _, name, record in records:
+            log.append(record)
+            # Written after each record, so an interrupted run resumes without duplicates
+            manifest.write(name + "\n")
+            manifest.flush()
+    return len(records)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate conversation JSON files into the segmented log")
+    parser.add_argument("--source", default="data", help="folder holding conversation_*.json files")
+    parser.add_argument("--dest", default=LOG_DIR, help="folder for the log segments")
+    args = parser.parse_args()
+    count = migrate_json_files(args.source, ConversationLog(args.dest))
+    print(f"Migrated {count} conversations into {args.dest}")
@@ -1,13 +1,18 @@
 import streamlit as st
 from datetime import datetime
-import requests
-import google.generativeai as genai
-import json
-from github import Github
-import re
+from gemini_client import (STREAM_RESPONSES, STRUCTURED_OUTPUT, interpret_query, interpret_query_structured,
+                           stream_query, render_streamed_response)
+from metrics import timed, begin_rerun, end_rerun
+from moderation import is_query_allowed
+from school_matcher import get_school_extractor, resolve_institution_names, school_choices
+from school_selection import SchoolSelection, school_checkboxes
+from storage import save_conversation_history_to_github, load_user_profile, save_user_profile, get_profile_writer
 import os
 import bcrypt
 
+# Profile this rerun when metrics.profile_reruns is set
+begin_rerun()
+
 # Initialize API Keys
 genai_api_key = st.secrets.get("google_gen_ai", {}).get("api_key", None)
 college_scorecard_api_key = st.secrets.get("college_scorecard", {}).get("api_key", None)
@@ -20,93 +25,10 @@ if not college_scorecard_api_key:
 if not github_token:
     st.error("GitHub token is missing.")
 
-# Initialize Google Gemini with API Key
-genai.configure(api_key=genai_api_key)
-
-# List of banned keywords
-banned_keywords = ['politics', 'violence', 'gambling', 'drugs', 'alcohol']
-
-def is_query_allowed(query):
-    return not any(keyword in query.lower() for keyword in banned_keywords)
-
-# Function to interpret the query using Google Gemini with chunking
-def interpret_query(query):
-    model = genai.GenerativeModel("gemini-pro")
-    chat = model.start_chat(history=[])
-    chunks = [query[i:i+1000] for i in range(0, len(query), 1000)]
-    responses = []
-    for chunk in chunks:
-        response = chat.send_message(chunk)
-        if hasattr(response, 'text'):
-            responses.append(response.text)
-        else:
-            break
-    return ' '.join(responses)
-
-# Function to fetch data from the College Scorecard API
-def fetch_college_data(state, keyword):
-    url = 'https://api.data.gov/ed/collegescorecard/v1/schools'
-    params = {
-        'api_key': college_scorecard_api_key,
-        'school.state': state,
-        'school.name': keyword,
-        'fields': 'school.name,school.city,school.state,latest.admissions.admission_rate.overall'
-    }
-    response = requests.get(url, params=params)
-    if response.status_code == 200:
-        return response.json().get('results', [])
-    return []
-
-# Function to save conversation history to GitHub
-def save_conversation_history_to_github(history):
-    file_content = json.dumps(history, indent=4)
-    file_name = f"conversation_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-    repo_name = "scooter7/collegechat"  # Replace with your repository name
-    folder_path = "data"  # Folder in the repository
-
-    try:
-        g = Github(github_token)
-        repo = g.get_repo(repo_name)
-
-        # Check if the folder exists, if not create it
-        try:
-            repo.get_contents(folder_path)
-        except:
-            repo.create_file(f"{folder_path}/.gitkeep", "Create folder", "")
-
-        # Create the file in the repo
-        repo.create_file(f"{folder_path}/{file_name}", f"Add {file_name}", file_content)
-    except Exception as e:
-        st.error(f"Failed to save file to GitHub: {e}")
-
-# Function to load user profile from GitHub
-def load_user_profile(username):
-    repo_name = "scooter7/collegechat"
-    file_path = f"user_profiles/{username}.json"
-    try:
-        g = Github(github_token)
-        repo = g.get_repo(repo_name)
-        file_content = repo.get_contents(file_path)
-        return json.loads(file_content.decoded_content.decode())
-    except Exception as e:
-        return None
-
-# Function to save user profile to GitHub
-def save_user_profile(username, profile):
-    file_content = json.dumps(profile, indent=4)
-    repo_name = "scooter7/collegechat"
-    file_path = f"user_profiles/{username}.json"
-    
-    try:
-        g = Github(github_token)
-        repo = g.get_repo(repo_name)
-        try:
-            file = repo.get_contents(file_path)
-            repo.update_file(file_path, f"Update profile for {username}", file_content, file.sha)
-        except:
-            repo.create_file(file_path, f"Create profile for {username}", file_content)
-    except Exception as e:
-        st.error(f"Failed to save profile to GitHub: {e}")
+# Function to extract the known institutions named in the bot response, as canonical IPEDS names
+@timed("extract_school_names")
+def extract_school_names(response):
+    return [match.name for match in get_school_extractor().extract(response)]
 
 # Function to hash a password
 def hash_password(password):
@@ -127,6 +49,7 @@ def login_screen():
         if st.button("Login"):
             user_profile = load_user_profile(username)
             if user_profile and verify_password(password, user_profile.get("password")):
+                get_profile_writer().mark_persisted(username, user_profile)
                 st.session_state['username'] = username
                 st.session_state['profile'] = user_profile
                 st.success("Logged in successfully")
@@ -156,7 +79,8 @@ def login_screen():
                     "zip_code": zip_code,
                     "selected_schools": []
                 }
-                save_user_profile(username, user_profile)
+                if save_user_profile(username, user_profile):
+                    get_profile_writer().mark_persisted(username, user_profile)
                 st.session_state['username'] = username
                 st.session_state['profile'] = user_profile
                 st.success("Signed up successfully")
@@ -166,6 +90,8 @@ def main_app():
     st.title('College Information Assistant')
 
     if st.button("Logout"):
+        # Write any debounced profile change before the session forgets the user
+        get_profile_writer().flush(st.session_state['username'])
         del st.session_state['username']
         del st.session_state['profile']
         st.experimental_set_query_params()
@@ -179,64 +105,73 @@ def main_app():
             st.session_state['submitted_query'] = query
             submitted_query = query
 
-            # Reset relevant session state variables
-            st.session_state['gemini_response_text'] = ""
-            st.session_state['relevant_schools'] = []
+            # Reset relevant session state variables, unless the same question is simply asked again
+            if query != st.session_state.get('answered_query'):
+                st.session_state['gemini_response_text'] = ""
+                st.session_state['relevant_schools'] = []
 
     if submitted_query:
         if not is_query_allowed(submitted_query):
             st.error("Your query contains topics that I'm not able to discuss. Please ask about colleges and universities.")
         else:
-            gemini_response_text = ""
-            relevant_schools = []
-
-            try:
-                gemini_response_text = interpret_query(submitted_query)
-                st.session_state['gemini_response_text'] = gemini_response_text
-                st.write(f"Bot Response: {gemini_response_text}")  # Display the bot response
-                # Extract unique, valid school names
-                relevant_schools = list(set(re.findall(r'\b[\w\s]+University\b|\b[\w\s]+College\b', gemini_response_text)))
-                relevant_schools = [school for school in relevant_schools if school.strip() and school != " College"]
-                # Initialize relevant_schools in session state if not already set
-                if 'relevant_schools' not in st.session_state or not st.session_state['relevant_schools']:
-                    st.session_state['relevant_schools'] = relevant_schools
-            except Exception as e:
-                st.error(f"Error interacting with Gemini.")
+            # Gemini is asked once per submitted query; widget reruns reuse the stored answer and schools
+            if st.session_state.get('answered_query') != submitted_query:
+                gemini_response_text = ""
+                relevant_schools = []
+
+                try:
+                    institutions = None
+                    answer_complete = True
+                    if STRUCTURED_OUTPUT:
+                        # Gemini lists the schools as data; an answer that fails validation comes back as text only
+                        gemini_response_text, institutions, answer_complete = interpret_query_structured(submitted_query)
+                        st.write(f"Bot Response: {gemini_response_text}")
+                    elif STREAM_RESPONSES:
+                        # Render tokens as they arrive, previewing schools from each completed line
+                        gemini_response_text, answer_complete = render_streamed_response(stream_query(submitted_query),
+                                                                                         extract_school_names)
+                    else:
+                        gemini_response_text, answer_complete = interpret_query(submitted_query)
+                        st.write(f"Bot Response: {gemini_response_text}")  # Display the bot response
+                    st.session_state['gemini_response_text'] = gemini_response_text
+                    # Extract unique, valid school names
+                    if institutions is not None:
+                        relevant_schools = resolve_institution_names(institutions)
+                    else:
+                        relevant_schools = extract_school_names(gemini_response_text)
+                    # Initialize relevant_schools in session state if not already set
+                    if 'relevant_schools' not in st.session_state or not st.session_state['relevant_schools']:
+                        st.session_state['relevant_schools'] = relevant_schools
+                    # A failed or cut-short answer is not remembered, so the next rerun asks again
+                    if gemini_response_text and answer_complete:
+                        st.session_state['answered_query'] = submitted_query
+                except Exception as e:
+                    st.error(f"Error interacting with Gemini.")
 
             # Debugging: Check the extracted school names
             st.write("Extracted Schools:", st.session_state['relevant_schools'])
 
     # Ensure session state is initialized for selected schools
     if 'selected_schools' not in st.session_state:
-        st.session_state['selected_schools'] = st.session_state['profile'].get('selected_schools', [])
+        st.session_state['selected_schools'] = SchoolSelection(
+            school_choices(st.session_state['profile'].get('selected_schools', []))
+        )
 
     # Display the stored bot response if available
     if 'gemini_response_text' in st.session_state:
         st.write(f"Bot Response: {st.session_state['gemini_response_text']}")
 
-    # Display checkboxes for school selection outside the form
-    if 'relevant_schools' in st.session_state and st.session_state['relevant_schools']:
-        st.write("Select the schools you are interested in:")
-        for school in st.session_state['relevant_schools']:
-            if school not in st.session_state:
-                st.session_state[school] = False
-            st.session_state[school] = st.checkbox(school, value=st.session_state[school])
-            if st.session_state[school]:
-                if school not in st.session_state['selected_schools']:
-                    st.session_state['selected_schools'].append(school)
-            else:
-                if school in st.session_state['selected_schools']:
-                    st.session_state['selected_schools'].remove(school)
-
-    # Save the selected schools to the user profile
-    st.session_state['profile']['selected_schools'] = st.session_state['selected_schools']
-    save_user_profile(st.session_state['username'], st.session_state['profile'])
-
-    # Form to save selected schools
+    # Form to pick and save schools; the checkboxes sit inside it, so all toggles are applied in one batch on submit
     with st.form(key="school_selection_form"):
+        choices = school_choices(st.session_state.get('relevant_schools', []))
+        if choices:
+            st.write("Select the schools you are interested in:")
+        checked_keys = school_checkboxes(choices, st.session_state['selected_schools'])
         submit_button = st.form_submit_button("Save Selection")
 
         if submit_button:
+            st.session_state['selected_schools'].apply(choices, checked_keys)
+            st.session_state['profile']['selected_schools'] = st.session_state['selected_schools'].names()
             if not st.session_state['selected_schools']:
                 st.error("Please select at least one school to continue.")
             else:
@@ -251,10 +186,16 @@ def main_app():
                 st.success("Your selection has been saved successfully")
 
             # Debugging: Check selected schools after submission
-            st.write("Selected Schools (after check):", st.session_state['selected_schools'])
+            st.write("Selected Schools (after check):", st.session_state['selected_schools'].names())
+
+    # Save the selected schools to the user profile, only when they changed and debounced across reruns
+    get_profile_writer().schedule(st.session_state['username'], st.session_state['profile'])
 
 # Main Logic
 if 'username' not in st.session_state:
     login_screen()
 else:
     main_app()
+
+# Dump the rerun profile and refresh exported metrics
+end_rerun("cxchatwli")
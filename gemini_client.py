@@ -0,0 +1,278 @@
+from concurrent.futures import ThreadPoolExecutor
+import json
+import logging
+import re
+import streamlit as st
+from lazy_imports import lazy_module
+from response_cache import CACHE_ENABLED, get_response_cache
+from semantic_cache import SEMANTIC_CACHE_ENABLED, get_semantic_cache
+from metrics import count, timed
+
+# The Gemini SDK takes longer to import than the rest of the app, so it is loaded with the first query
+genai = lazy_module("google.generativeai")
+
+# Gemini settings, overridable from the [google_gen_ai] secrets section
+MODEL_NAME = st.secrets.get("google_gen_ai", {}).get("model", "gemini-pro")
+STREAM_RESPONSES = st.secrets.get("google_gen_ai", {}).get("stream", True)
+# Send the chunks of a long query concurrently instead of one after another on a single chat
+PARALLEL_CHUNKS = st.secrets.get("google_gen_ai", {}).get("parallel_chunks", False)
+MAX_CONCURRENT_CHUNKS = st.secrets.get("google_gen_ai", {}).get("max_concurrent_chunks", 4)
+CHUNK_SIZE = 1000
+# Ask Gemini for the answer and its schools as JSON instead of free text. Gemini 1.5 and later models constrain the
+# reply to RESPONSE_SCHEMA; older ones such as gemini-pro reject response_schema, so they only get the JSON prompt
+STRUCTURED_OUTPUT = st.secrets.get("google_gen_ai", {}).get("structured_output", False)
+
+logger = logging.getLogger(__name__)
+
+STRUCTURED_PROMPT = (
+    "Answer the question below about colleges and universities. Reply with JSON only, in the form "
+    '{{"answer": "<the answer in Markdown>", "institutions": [{{"name": "<official institution name>", '
+    '"city": "<city>", "state": "<two-letter state code>"}}]}}, listing every institution the answer mentions.\n\n'
+    "Question: {query}"
+)
+RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "answer": {"type": "string"},
+        "institutions": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {"name": {"type": "string"}, "city": {"type": "string"}, "state": {"type": "string"}},
+                "required": ["name"],
+            },
+        },
+    },
+    "required": ["answer", "institutions"],
+}
+
+# Function to tell whether a model accepts response_mime_type and response_schema, which Gemini 1.5 and later do
+def supports_json_mode(model_name):
+    version = re.search(r"gemini-(\d+(?:\.\d+)?)", model_name)
+    return version is not None and float(version.group(1)) >= 1.5
+
+# Detected from the model name, or set with json_mode for a model the name does not tell about
+JSON_MODE = st.secrets.get("google_gen_ai", {}).get("json_mode", supports_json_mode(MODEL_NAME))
+
+# Function to configure the SDK and build the model once per process, when a query first needs it
+@st.cache_resource(show_spinner=False)
+def get_gemini_model():
+    genai.configure(api_key=st.secrets.get("google_gen_ai", {}).get("api_key", None))
+    return genai.GenerativeModel(MODEL_NAME)
+
+# Function to split a long query into the chunks sent to Gemini
+def split_query(query):
+    return [query[i:i+CHUNK_SIZE] for i in range(0, len(query), CHUNK_SIZE)]
+
+# Function to find a cached answer for the exact query, then for a near-duplicate wording
+def lookup_cached_response(query):
+    if CACHE_ENABLED:
+        cached = get_response_cache().get(query, MODEL_NAME)
+        if cached is not None:
+            count("gemini_cache_hits")
+            return cached
+    if SEMANTIC_CACHE_ENABLED:
+        similar = get_semantic_cache(MODEL_NAME).lookup(query)
+        if similar is not None:
+            count("gemini_semantic_cache_hits")
+            return similar["response"]
+    return None
+
+# Function to record the size of a query sent to Gemini
+def count_request(chunks):
+    count("gemini_requests")
+    count("gemini_chunks", len(chunks))
+    count("gemini_request_chars", sum(len(chunk) for chunk in chunks))
+
+# Function to remember a complete answer in both caches
+def store_response(query, text):
+    if CACHE_ENABLED:
+        get_response_cache().put(query, MODEL_NAME, text)
+    if SEMANTIC_CACHE_ENABLED:
+        get_semantic_cache(MODEL_NAME).add(query, text)
+
+# Function to send one chunk as its own single-turn request, returning (text, error)
+def send_independent_chunk(model, chunk):
+    response = model.generate_content(chunk)
+    try:
+        return response.text, None
+    except ValueError:
+        return None, getattr(response, 'finish_reason', 'Unknown error')
+
+# Function to send all chunks concurrently, yielding (text, error) pairs in query order
+def dispatch_chunks(chunks):
+    model = get_gemini_model()
+    workers = max(1, min(MAX_CONCURRENT_CHUNKS, len(chunks)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # map keeps the original order even when later chunks finish first
+        yield from executor.map(lambda chunk: send_independent_chunk(model, chunk), chunks)
+
+# Function to stream the Gemini answer for a query as text fragments, serving repeats from the cache
+@timed("interpret_query")
+def stream_query(query, parallel=PARALLEL_CHUNKS):
+    cached = lookup_cached_response(query)
+    if cached is not None:
+        yield cached
+        return
+
+    fragments = []
+    for fragment in generate_fragments(query, parallel):
+        if fragment is None:
+            # A failed answer is shown as-is but never cached, and the trailing None tells the reader it was cut short
+            yield None
+            return
+        fragments.append(fragment)
+        yield fragment
+    text = ''.join(fragments)
+    count("gemini_response_chars", len(text))
+    if text:
+        store_response(query, text)
+
+# Function to generate the Gemini answer fragments, or stop early with None after an error
+def generate_fragments(query, parallel):
+    chunks = split_query(query)
+    count_request(chunks)
+    if parallel and len(chunks) > 1:
+        # Concurrent chunks arrive whole, so each one is streamed as a single fragment
+        for i, (text, error) in enumerate(dispatch_chunks(chunks)):
+            if error is not None:
+                st.error(f"Error interacting with Gemini: {error}")
+                yield None
+                return
+            yield (' ' if i else '') + text
+        return
+
+    chat = get_gemini_model().start_chat(history=[])
+    for i, chunk in enumerate(chunks):
+        if i:
+            yield ' '
+        for part in chat.send_message(chunk, stream=True):
+            try:
+                yield part.text
+            except ValueError:
+                st.error(f"Error interacting with Gemini: {getattr(part, 'finish_reason', 'Unknown error')}")
+                yield None
+                return
+
+# Function to interpret the query using Google Gemini with chunking, serving repeats from the cache
+# Returns (text, complete), where complete is False when a chunk failed and the text is only the part before it
+@timed("interpret_query")
+def interpret_query(query, parallel=PARALLEL_CHUNKS):
+    cached = lookup_cached_response(query)
+    if cached is not None:
+        return cached, True
+
+    chunks = split_query(query)
+    count_request(chunks)
+    responses = []
+    failed = False
+    if parallel and len(chunks) > 1:
+        for text, error in dispatch_chunks(chunks):
+            if error is not None:
+                st.error(f"Error interacting with Gemini: {error}")
+                failed = True
+                break
+            responses.append(text)
+    else:
+        chat = get_gemini_model().start_chat(history=[])
+        for chunk in chunks:
+            response = chat.send_message(chunk)
+            if hasattr(response, 'text'):
+                responses.append(response.text)
+            else:
+                st.error(f"Error interacting with Gemini: {getattr(response, 'finish_reason', 'Unknown error')}")
+                failed = True
+                break
+
+    text = ' '.join(responses)
+    count("gemini_response_chars", len(text))
+    if text and not failed:
+        store_response(query, text)
+    return text, not failed
+
+# Function to validate a structured answer, returning (text, institutions) or None when it does not fit the schema
+def parse_structured_answer(raw):
+    # Models without a JSON mode tend to wrap the object in a Markdown code fence
+    raw = re.sub(r"^\s*```(?:json)?\s*|\s*```\s*$", "", raw or "")
+    try:
+        data = json.loads(raw)
+    except ValueError:
+        return None
+    if not isinstance(data, dict) or not isinstance(data.get("answer"), str) or not data["answer"].strip():
+        return None
+    if not isinstance(data.get("institutions"), list):
+        return None
+    institutions = []
+    for item in data["institutions"]:
+        if not isinstance(item, dict) or not isinstance(item.get("name"), str) or not item["name"].strip():
+            return None
+        city, state = item.get("city"), item.get("state")
+        institutions.append({
+            "name": item["name"].strip(),
+            "city": city.strip() if isinstance(city, str) and city.strip() else None,
+            "state": state.strip().upper() if isinstance(state, str) and state.strip() else None,
+        })
+    return data["answer"], institutions
+
+# Function to interpret the query as structured JSON, returning (text, institutions, complete)
+# Institutions is None when the answer came from the text path, and complete is False when that answer was cut short
+@timed("interpret_query")
+def interpret_query_structured(query):
+    # Structured answers are cached apart from text ones, since the two are stored in different shapes
+    cache_model = f"{MODEL_NAME}:json"
+    if CACHE_ENABLED:
+        parsed = parse_structured_answer(get_response_cache().get(query, cache_model))
+        if parsed is not None:
+            count("gemini_cache_hits")
+            return parsed + (True,)
+
+    # Long queries need the chunked chat, which only the text path supports
+    if len(split_query(query)) == 1:
+        count_request([query])
+        # Sending the schema to a model without JSON mode fails outright, so those rely on the prompt alone
+        generation_config = None
+        if JSON_MODE:
+            generation_config = {"response_mime_type": "application/json", "response_schema": RESPONSE_SCHEMA}
+        try:
+            response = get_gemini_model().generate_content(STRUCTURED_PROMPT.format(query=query),
+                                                           generation_config=generation_config)
+            raw = response.text
+        except Exception as e:
+            logger.warning("Structured Gemini request failed: %s", e)
+            raw = None
+        parsed = parse_structured_answer(raw)
+        if parsed is not None:
+            count("gemini_response_chars", len(raw))
+            if CACHE_ENABLED:
+                get_response_cache().put(query, cache_model, raw)
+            return parsed + (True,)
+        count("gemini_structured_fallbacks")
+    text, complete = interpret_query(query)
+    return text, None, complete
+
+# Function to render a streamed answer as it arrives, extracting schools from each completed line
+# Returns (text, complete), where complete is False when the stream failed part way through
+def render_streamed_response(fragments, extract_school_names):
+    response_area = st.empty()
+    schools_area = st.empty()
+    text = ""
+    scanned = 0
+    schools = []
+    complete = True
+    for fragment in fragments:
+        if fragment is None:
+            complete = False
+            break
+        text += fragment
+        response_area.markdown(f"Bot Response: {text}")
+
+        # Only lines that are already complete are scanned, so a name is never cut in half
+        end = text.rfind("\n") + 1
+        if end > scanned:
+            for school in extract_school_names(text[scanned:end]):
+                if school not in schools:
+                    schools.append(school)
+            scanned = end
+            schools_area.markdown("\n".join(f"- [ ] {school}" for school in schools))
+    schools_area.empty()
+    return text, complete
@@ -0,0 +1,223 @@
+import atexit
+import copy
+from datetime import datetime
+import json
+import logging
+import os
+import threading
+import time
+import streamlit as st
+from github import Github, GithubException, InputGitTreeElement, UnknownObjectException
+from metrics import count, span
+
+logger = logging.getLogger(__name__)
+
+# GitHub settings, overridable from the [github] secrets section
+GITHUB_SETTINGS = st.secrets.get("github", {})
+github_token = GITHUB_SETTINGS.get("token", None)
+REPO_NAME = GITHUB_SETTINGS.get("repo", "scooter7/collegechat")
+HISTORY_FOLDER = "data"
+PROFILE_FOLDER = "user_profiles"
+# Profiles read within this window are served without even a conditional request
+PROFILE_REVALIDATE_SECONDS = GITHUB_SETTINGS.get("profile_revalidate_seconds", 30)
+BATCH_SIZE = GITHUB_SETTINGS.get("batch_size", 20)
+FLUSH_SECONDS = GITHUB_SETTINGS.get("flush_seconds", 30)
+SPILL_PATH = GITHUB_SETTINGS.get("spill_path", "conversation_spill.jsonl")
+
+# Function to get the GitHub repository handle shared by every session
+@st.cache_resource(show_spinner=False)
+def get_github_repo():
+    return Github(github_token).get_repo(REPO_NAME)
+
+class ConversationWriter:
+    def __init__(self, spill_path=SPILL_PATH, batch_size=BATCH_SIZE, flush_seconds=FLUSH_SECONDS):
+        self.spill_path = spill_path
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.wake = threading.Event()
+        self.pending = self.read_spill()
+        self.worker = threading.Thread(target=self.run, name="conversation-writer", daemon=True)
+        self.worker.start()
+        atexit.register(self.flush_safely)
+
+    # Function to reload records queued before a restart
+    def read_spill(self):
+        if not os.path.exists(self.spill_path):
+            return []
+        records = []
+        damaged = False
+        with open(self.spill_path) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    # A kill during an append leaves a partly written last line
+                    damaged = True
+        if damaged:
+            logger.warning("Dropped an unreadable record from %s", self.spill_path)
+            # Rewritten so later appends start on a fresh line instead of continuing the broken one
+            self.write_spill(records)
+        return records
+
+    # Function to rewrite the spill file with the records still waiting for a commit
+    def write_spill(self, records):
+        tmp_path = f"{self.spill_path}.tmp"
+        with open(tmp_path, "w") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+        os.replace(tmp_path, self.spill_path)
+
+    # Function to queue a conversation record, returning as soon as it is on local disk
+    def enqueue(self, history):
+        file_name = f"conversation_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.json"
+        record = {"path": f"{HISTORY_FOLDER}/{file_name}", "history": history}
+        # Serialized before queueing, so a record JSON cannot hold fails here instead of blocking every later batch
+        line = json.dumps(record) + "\n"
+        with self.lock:
+            with open(self.spill_path, "a") as f:
+                f.write(line)
+            self.pending.append(record)
+            if len(self.pending) >= self.batch_size:
+                self.wake.set()
+
+    # Function to run the time-based flush loop in the background
+    def run(self):
+        while True:
+            self.wake.wait(self.flush_seconds)
+            self.wake.clear()
+            self.flush_safely()
+
+    # Function to flush without raising, for the background thread and interpreter exit
+    def flush_safely(self):
+        try:
+            self.flush()
+        except Exception as e:
+            # Records stay queued and in the spill file, so the next attempt retries them
+            logger.warning("Failed to commit conversation batch to GitHub: %s", e)
+
+    # Function to commit every queued record as a single commit through the Git data API
+    def flush(self):
+        with self.flush_lock:
+            with self.lock:
+                batch = list(self.pending)
+            if not batch:
+                return
+
+            with span("github_flush", records=len(batch)):
+                self.commit_batch(batch)
+            count("github_flushed_records", len(batch))
+
+            with self.lock:
+                self.pending = self.pending[len(batch):]
+                self.write_spill(self.pending)
+
+    # Function to write a batch of records as one commit
+    def commit_batch(self, batch):
+        repo = get_github_repo()
+        ref = repo.get_git_ref(f"heads/{repo.default_branch}")
+        parent = repo.get_git_commit(ref.object.sha)
+        elements = [
+            InputGitTreeElement(record["path"], "100644", "blob", content=json.dumps(record["history"], indent=4))
+            for record in batch
+        ]
+        tree = repo.create_git_tree(elements, parent.tree)
+        commit = repo.create_git_commit(f"Add {len(batch)} conversation(s)", tree, [parent])
+        ref.edit(commit.sha)
+
+# Function to get the write-behind queue shared by every session in this process
+@st.cache_resource(show_spinner=False)
+def get_conversation_writer():
+    return ConversationWriter()
+
+class ProfileCache:
+    def __init__(self, revalidate_seconds=PROFILE_REVALIDATE_SECONDS):
+        self.revalidate_seconds = revalidate_seconds
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    # Function to read a profile, revalidating a cached copy with its ETag instead of refetching it
+    def get(self, username):
+        with self.lock:
+            entry = self.entries.get(username)
+        now = time.time()
+        if entry and now - entry["checked_at"] < self.revalidate_seconds:
+            return copy.deepcopy(entry["profile"])
+
+        if entry:
+            # update() sends If-None-Match and returns False on a 304 Not Modified
+            if entry["file"].update():
+                entry["profile"] = json.loads(entry["file"].decoded_content.decode())
+        else:
+            file = get_github_repo().get_contents(f"{PROFILE_FOLDER}/{username}.json")
+            entry = {"file": file, "profile": json.loads(file.decoded_content.decode())}
+        entry["checked_at"] = now
+        with self.lock:
+            self.entries[username] = entry
+        return copy.deepcopy(entry["profile"])
+
+    # Function to get the blob SHA of the cached profile, if any
+    def sha(self, username):
+        with self.lock:
+            entry = self.entries.get(username)
+        return entry["file"].sha if entry else None
+
+    # Function to record a profile that was just written
+    def store(self, username, file, profile):
+        entry = {"file": file, "profile": copy.deepcopy(profile), "checked_at": time.time()}
+        with self.lock:
+            self.entries[username] = entry
+
+    # Function to forget a profile whose cached SHA turned out to be stale
+    def invalidate(self, username):
+        with self.lock:
+            self.entries.pop(username, None)
+
+# Function to get the profile cache shared by every session in this process
+@st.cache_resource(show_spinner=False)
+def get_profile_cache():
+    return ProfileCache()
+
+# Function to write a profile using the cached blob SHA, looking it up only when unknown
+def write_user_profile(username, profile, file_content):
+    repo = get_github_repo()
+    cache = get_profile_cache()
+    file_path = f"{PROFILE_FOLDER}/{username}.json"
+    sha = cache.sha(username)
+    if sha is None:
+        try:
+            sha = repo.get_contents(file_path).sha
+        except UnknownObjectException:
+            sha = None
+    if sha:
+        result = repo.update_file(file_path, f"Update profile for {username}", file_content, sha)
+    else:
+        result = repo.create_file(file_path, f"Create profile for {username}", file_content)
+    cache.store(username, result["content"], profile)
+
+class GitHubStorage:
+    # Function to queue a conversation record for the next batched commit
+    def save_conversation(self, history):
+        get_conversation_writer().enqueue(history)
+
+    # Function to read a profile through the revalidating cache, or None when it does not exist
+    def load_profile(self, username):
+        try:
+            return get_profile_cache().get(username)
+        except UnknownObjectException:
+            return None
+
+    # Function to write a profile, retrying once when the cached SHA is stale
+    def save_profile(self, username, profile):
+        file_content = json.dumps(profile, indent=4)
+        try:
+            write_user_profile(username, profile, file_content)
+        except GithubException as e:
+            if e.status != 409:
+                raise
+            # Another process changed the profile since it was cached, so retry with a fresh SHA
+            get_profile_cache().invalidate(username)
+            write_user_profile(username, profile, file_content)
@@ -0,0 +1,46 @@
+import os
+import streamlit as st
+from lazy_imports import lazy_module
+
+# pypeds and pandas are only needed once the snapshot is actually loaded or built
+pd = lazy_module("pandas")
+ipeds = lazy_module("pypeds.ipeds")
+
+# Location of the on-disk IPEDS snapshots
+SNAPSHOT_DIR = st.secrets.get("ipeds", {}).get("snapshot_dir", "ipeds_cache")
+SNAPSHOT_YEAR = 2021
+# Bumped whenever the snapshot's column types change, so files written by older code are rebuilt instead of reused
+SNAPSHOT_FORMAT = 2
+
+# Function to get the path of the columnar HD snapshot for a survey year
+def snapshot_path(year=SNAPSHOT_YEAR):
+    return os.path.join(SNAPSHOT_DIR, f"hd{year}.v{SNAPSHOT_FORMAT}.parquet")
+
+# Function to download the HD survey once and convert it to a Parquet file
+def build_hd_snapshot(year=SNAPSHOT_YEAR):
+    hd = ipeds.HD(years=[year])
+    hd.extract()
+    df = hd.load()
+
+    # Parquet needs one type per column, so text columns with mixed values become strings (keeping NaN)
+    for column in df.columns[df.dtypes == object]:
+        df[column] = df[column].where(df[column].isna(), df[column].astype(str))
+
+    path = snapshot_path(year)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Write to a temporary file first so other processes never read a partial snapshot
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+    return path
+
+# Function to load the HD snapshot once per process, shared by every session
+@st.cache_resource(show_spinner="Loading IPEDS data...")
+def load_hd_snapshot(year=SNAPSHOT_YEAR):
+    path = snapshot_path(year)
+    if not os.path.exists(path):
+        build_hd_snapshot(year)
+    return pd.read_parquet(path)
+
+if __name__ == "__main__":
+    print(f"Wrote {build_hd_snapshot()}")
@@ -1,12 +1,19 @@
 import streamlit as st
 from datetime import datetime
-import google.generativeai as genai
-from pypeds import ipeds
-import pandas as pd
-import json
-from github import Github
-import re
-from rapidfuzz import process, fuzz
+from gemini_client import (STREAM_RESPONSES, STRUCTURED_OUTPUT, interpret_query, interpret_query_structured,
+                           stream_query, render_streamed_response)
+from ipeds_snapshot import load_hd_snapshot
+from metrics import timed, begin_rerun, end_rerun
+from moderation import is_query_allowed
+from storage import save_conversation_history_to_github
+from school_matcher import get_match_index, get_school_extractor, resolve_institution_names
+from scorecard import fetch_college_details
+from lazy_imports import lazy_module
+
+pd = lazy_module("pandas")
+
+# Profile this rerun when metrics.profile_reruns is set
+begin_rerun()
 
 # Initialize API Keys
 genai_api_key = st.secrets.get("google_gen_ai", {}).get("api_key", None)
@@ -17,93 +24,40 @@ if not genai_api_key:
 if not github_token:
     st.error("GitHub token is missing.")
 
-# Initialize Google Gemini with API Key
-genai.configure(api_key=genai_api_key)
-
-# List of banned keywords
-banned_keywords = ['politics', 'violence', 'gambling', 'drugs', 'alcohol']
-
-def is_query_allowed(query):
-    return not any(keyword in query.lower() for keyword in banned_keywords)
-
-# Function to interpret the query using Google Gemini with chunking
-def interpret_query(query):
-    model = genai.GenerativeModel("gemini-pro")
-    chat = model.start_chat(history=[])
-    chunks = [query[i:i+1000] for i in range(0, len(query), 1000)]
-    responses = []
-    for chunk in chunks:
-        response = chat.send_message(chunk)
-        if hasattr(response, 'text'):
-            responses.append(response.text)
-        else:
-            st.error(f"Error interacting with Gemini: {getattr(response, 'finish_reason', 'Unknown error')}")
-            break
-    return ' '.join(responses)
-
-# Function to fetch data from IPEDS using pypeds
+# Function to fetch data from IPEDS using the shared on-disk snapshot
+@timed("fetch_ipeds_data")
 def fetch_ipeds_data():
     try:
-        # Set the year to 2021
-        years = [2021]
-        # Instantiate the survey of interest
-        hd = ipeds.HD(years=years)
-        # Extract, or download the surveys
-        hd.extract()
-        # Load the surveys as a pandas dataframe
-        df = hd.load()
-        return df
+        # The snapshot is shared across sessions, so it must not be modified in place
+        return load_hd_snapshot()
     except Exception as e:
         st.error(f"Error fetching IPEDS data: {e}")
         return pd.DataFrame()
 
-# Function to extract school names from the bot response using a more comprehensive regex
+# Function to extract the known institutions named in the bot response, as canonical IPEDS names
+@timed("extract_school_names")
 def extract_school_names(response):
-    school_pattern = r'\b(?:[\w\s]+University|[\w\s]+College|[\w\s]+Institute|[\w\s]+Academy|[\w\s]+School|[\w\s]+Center|[\w\s]+Centre|University of [\w\s]+|College of [\w\s]+)\b'
-    matches = re.findall(school_pattern, response)
-    return list(set(matches))
+    return [match.name for match in get_school_extractor().extract(response)]
 
-# Function to filter IPEDS data based on relevant school names using fuzzy matching
+# Function to filter IPEDS data based on relevant school names using the match index
+@timed("filter_ipeds_data")
 def filter_ipeds_data(ipeds_data, relevant_schools):
     if ipeds_data.empty or not relevant_schools:
         st.write("No relevant schools found or IPEDS data is empty.")
         return pd.DataFrame()
     
     if 'instnm' in ipeds_data.columns:
-        matched_schools = []
-        for school in relevant_schools:
-            match = process.extractOne(school, ipeds_data['instnm'], scorer=fuzz.token_sort_ratio, score_cutoff=80)
-            if match:
-                matched_schools.append(match[0])
-        
-        filtered_data = ipeds_data[ipeds_data['instnm'].isin(matched_schools)]
+        # Names are canonical, or ones IPEDS cannot place on one campus, which fuzzy scoring would misplace
+        index = get_match_index()
+        rows = [index.resolve_alias(school) for school in relevant_schools]
+        matched_unitids = {index.unitids[row] for row in rows if row is not None}
+
+        filtered_data = ipeds_data[ipeds_data['unitid'].isin(matched_unitids)]
         return filtered_data
     else:
         st.error("The column 'instnm' does not exist in the IPEDS data.")
         return pd.DataFrame()
 
-# Function to save conversation history to GitHub
-def save_conversation_history_to_github(history):
-    file_content = json.dumps(history, indent=4)
-    file_name = f"conversation_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-    repo_name = "scooter7/collegechat"  # Replace with your repository name
-    folder_path = "data"  # Folder in the repository
-
-    try:
-        g = Github(github_token)
-        repo = g.get_repo(repo_name)
-
-        # Check if the folder exists, if not create it
-        try:
-            repo.get_contents(folder_path)
-        except:
-            repo.create_file(f"{folder_path}/.gitkeep", "Create folder", "")
-
-        # Create the file in the repo
-        repo.create_file(f"{folder_path}/{file_name}", f"Add {file_name}", file_content)
-    except Exception as e:
-        st.error(f"Failed to save file to GitHub: {e}")
-
 # Streamlit app UI
 st.title('IPEDS Data Chatbot')
 
@@ -116,11 +70,23 @@ if st.button("Ask"):
         else:
             try:
                 # Interpret the query using Google Gemini
-                gemini_response_text = interpret_query(query)
-                st.write(f"Bot Response: {gemini_response_text}")
-
-                # Extract school names from the bot response
-                relevant_schools = extract_school_names(gemini_response_text)
+                institutions = None
+                if STRUCTURED_OUTPUT:
+                    # Gemini lists the schools as data; an answer that fails validation comes back as text only
+                    gemini_response_text, institutions, _ = interpret_query_structured(query)
+                    st.write(f"Bot Response: {gemini_response_text}")
+                elif STREAM_RESPONSES:
+                    # Render tokens as they arrive, previewing schools from each completed line
+                    gemini_response_text, _ = render_streamed_response(stream_query(query), extract_school_names)
+                else:
+                    gemini_response_text, _ = interpret_query(query)
+                    st.write(f"Bot Response: {gemini_response_text}")
+
+                # Extract school names from the bot response, or take the ones Gemini listed
+                if institutions is not None:
+                    relevant_schools = resolve_institution_names(institutions)
+                else:
+                    relevant_schools = extract_school_names(gemini_response_text)
 
                 # Display the extracted school names
                 st.write("Extracted Schools:", relevant_schools)
@@ -128,12 +94,15 @@ if st.button("Ask"):
                 # Fetch data from IPEDS using pypeds
                 ipeds_data = fetch_ipeds_data()
 
-                # Display column names for debugging purposes
-                st.write("IPEDS Data Columns:", ipeds_data.columns)
-
                 # Filter the IPEDS data based on the relevant school names using fuzzy matching
                 filtered_ipeds_data = filter_ipeds_data(ipeds_data, relevant_schools)
-                st.write("Filtered IPEDS Data:", filtered_ipeds_data)
+
+                # Join College Scorecard details for every matched school, fetched in batches by unitid
+                school_table = filtered_ipeds_data
+                if not filtered_ipeds_data.empty:
+                    college_details = fetch_college_details(filtered_ipeds_data['unitid'])
+                    school_table = filtered_ipeds_data.merge(college_details, on='unitid', how='left')
+                st.write("Filtered IPEDS Data:", school_table)
 
                 # Save conversation history to GitHub
                 history = {
@@ -148,3 +117,6 @@ if st.button("Ask"):
                 st.error(f"Error: {e}")
     else:
         st.write("Please enter a query.")
+
+# Dump the rerun profile and refresh exported metrics
+end_rerun("ipedsapi")
@@ -0,0 +1,20 @@
+import importlib
+
+# Stand-in for a heavy module that is only imported the first time one of its attributes is used
+class LazyModule:
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attribute):
+        if self._module is None:
+            # importlib holds the import lock, so concurrent first uses still import the module once
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attribute)
+
+    def __repr__(self):
+        return f"<lazy module {self._name!r}{' (loaded)' if self._module is not None else ''}>"
+
+# Function to declare a module import that is deferred until the module is actually used
+def lazy_module(name):
+    return LazyModule(name)
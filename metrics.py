@@ -0,0 +1,119 @@
+import cProfile
+from contextlib import contextmanager
+from datetime import datetime
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+import streamlit as st
+
+# Metrics settings, overridable from the [metrics] secrets section
+METRICS_SETTINGS = st.secrets.get("metrics", {})
+METRICS_ENABLED = METRICS_SETTINGS.get("enabled", True)
+JSONL_PATH = METRICS_SETTINGS.get("jsonl_path", None)
+PROMETHEUS_PATH = METRICS_SETTINGS.get("prometheus_path", None)
+PROFILE_RERUNS = METRICS_SETTINGS.get("profile_reruns", False)
+PROFILE_DIR = METRICS_SETTINGS.get("profile_dir", "profiles")
+METRIC_PREFIX = "collegechat"
+
+lock = threading.Lock()
+# Per-stage duration aggregates: stage -> {"count", "sum", "max"}
+stage_seconds = {}
+# Monotonic counters such as Gemini chunk counts and character sizes
+counters = {}
+
+# Function to add one duration to a stage and optionally log it as a JSON line
+def observe(stage, seconds, **attributes):
+    if not METRICS_ENABLED:
+        return
+    with lock:
+        stats = stage_seconds.setdefault(stage, {"count": 0, "sum": 0.0, "max": 0.0})
+        stats["count"] += 1
+        stats["sum"] += seconds
+        stats["max"] = max(stats["max"], seconds)
+        if JSONL_PATH:
+            event = {"timestamp": datetime.now().isoformat(), "stage": stage, "seconds": seconds, **attributes}
+            with open(JSONL_PATH, "a") as f:
+                f.write(json.dumps(event, default=str) + "\n")
+
+# Function to increase a counter
+def count(name, amount=1):
+    if not METRICS_ENABLED:
+        return
+    with lock:
+        counters[name] = counters.get(name, 0) + amount
+
+# Function to time a block of code as one span of a pipeline stage
+@contextmanager
+def span(stage, **attributes):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - started, **attributes)
+
+# Function to time every call of a function, including the full consumption of a generator
+def timed(stage):
+    def decorator(function):
+        if inspect.isgeneratorfunction(function):
+            @functools.wraps(function)
+            def generator_wrapper(*args, **kwargs):
+                with span(stage):
+                    yield from function(*args, **kwargs)
+            return generator_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+# Function to render the collected metrics in the Prometheus text exposition format
+def export_prometheus():
+    with lock:
+        stages = {stage: dict(stats) for stage, stats in stage_seconds.items()}
+        totals = dict(counters)
+    lines = [f"# TYPE {METRIC_PREFIX}_stage_seconds summary"]
+    for stage, stats in sorted(stages.items()):
+        lines.append(f'{METRIC_PREFIX}_stage_seconds_count{{stage="{stage}"}} {stats["count"]}')
+        lines.append(f'{METRIC_PREFIX}_stage_seconds_sum{{stage="{stage}"}} {stats["sum"]:.6f}')
+    lines.append(f"# TYPE {METRIC_PREFIX}_stage_seconds_max gauge")
+    for stage, stats in sorted(stages.items()):
+        lines.append(f'{METRIC_PREFIX}_stage_seconds_max{{stage="{stage}"}} {stats["max"]:.6f}')
+    for name, value in sorted(totals.items()):
+        lines.append(f"# TYPE {METRIC_PREFIX}_{name}_total counter")
+        lines.append(f"{METRIC_PREFIX}_{name}_total {value}")
+    return "\n".join(lines) + "\n"
+
+# Function to start the per-rerun profiler when it is switched on
+def begin_rerun():
+    if not PROFILE_RERUNS:
+        return
+    # A rerun cut short by st.stop or a new click never reached end_rerun, so its profiler is dropped here
+    stale = st.session_state.pop('_rerun_profiler', None)
+    if stale is not None:
+        stale.disable()
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # From Python 3.12 only one profiler can run per process, so a rerun overlapping another session's is skipped
+        count("profile_skipped_reruns")
+        return
+    st.session_state['_rerun_profiler'] = profiler
+
+# Function to finish a rerun: dump its profile and refresh the Prometheus file
+def end_rerun(app_name):
+    profiler = st.session_state.pop('_rerun_profiler', None)
+    if profiler is not None:
+        profiler.disable()
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        profiler.dump_stats(os.path.join(PROFILE_DIR, f"{app_name}_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.prof"))
+    if PROMETHEUS_PATH:
+        tmp_path = f"{PROMETHEUS_PATH}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(export_prometheus())
+        os.replace(tmp_path, PROMETHEUS_PATH)
@@ -0,0 +1,86 @@
+from collections import Counter
+import logging
+import os
+import re
+import threading
+try:
+    import tomllib
+except ImportError:
+    # tomllib is only in the standard library from Python 3.11
+    import tomli as tomllib
+import streamlit as st
+from metrics import count, timed
+from phrase_automaton import PhraseAutomaton
+
+# Moderation settings, overridable from the [moderation] secrets section
+MODERATION_SETTINGS = st.secrets.get("moderation", {})
+TERMS_PATH = MODERATION_SETTINGS.get("terms_path", os.path.join(os.path.dirname(__file__), "moderation_terms.toml"))
+
+# The original keyword list, used when the terms file cannot be read so moderation never silently turns off
+DEFAULT_RULES = {keyword: [keyword] for keyword in ['politics', 'violence', 'gambling', 'drugs', 'alcohol']}
+
+# Digits commonly typed in place of letters to slip a word past a filter
+LEET_DIGITS = str.maketrans("013457", "oieast")
+
+logger = logging.getLogger(__name__)
+
+# Function to read a word with letter-like digits as letters, leaving plain numbers such as years alone
+def fold_leet(word):
+    if word.isdigit() or not any(character.isdigit() for character in word):
+        return word
+    return word.translate(LEET_DIGITS)
+
+# Function to read the moderation rules, as {rule: [terms]}, from a TOML terms file
+def load_rules(path=TERMS_PATH):
+    try:
+        with open(path, "rb") as f:
+            config = tomllib.load(f)
+    except (OSError, tomllib.TOMLDecodeError) as e:
+        logger.warning("Failed to load moderation terms from %s, using the default list: %s", path, e)
+        return DEFAULT_RULES
+    return {rule: list(table.get("terms", [])) for rule, table in config.items() if isinstance(table, dict)}
+
+class Moderator:
+    def __init__(self, rules):
+        # Every term of every rule goes into one automaton, so a check is one pass whatever the list size
+        self.automaton = PhraseAutomaton(fold=fold_leet)
+        for rule, terms in rules.items():
+            for term in terms:
+                self.automaton.add(term, (rule, term))
+        self.automaton.build()
+        self.hits = Counter()
+        self.lock = threading.Lock()
+
+    # Function to list the (rule, term) pairs a query hits
+    def check(self, query):
+        return [value for _, _, value in self.automaton.find(query)]
+
+    # Function to decide whether a query may be answered, counting the rules it hits
+    def allows(self, query):
+        hits = self.check(query)
+        if not hits:
+            return True
+        with self.lock:
+            self.hits.update(hits)
+        count("moderation_blocked")
+        for rule in {rule for rule, _ in hits}:
+            count(f"moderation_{re.sub(r'[^a-z0-9_]', '_', rule.lower())}_hits")
+        return False
+
+    # Function to total the hits per rule since the process started
+    def rule_hits(self):
+        with self.lock:
+            totals = Counter()
+            for (rule, _), hits in self.hits.items():
+                totals[rule] += hits
+            return totals
+
+# Function to build the moderator once per process from the terms file
+@st.cache_resource(show_spinner=False)
+def get_moderator():
+    return Moderator(load_rules())
+
+# Function to check a query against the moderation rules
+@timed("is_query_allowed")
+def is_query_allowed(query):
+    return get_moderator().allows(query)
@@ -0,0 +1,116 @@
+from collections import deque
+import re
+import unicodedata
+
+WORD_PATTERN = re.compile(r"[^\W_]+|&")
+# Gaps containing any of these end a phrase: line breaks, Markdown markup, brackets and clause punctuation
+BREAK_PATTERN = re.compile(r"[\n\r*#|:;()\[\]!?•]")
+
+# Function to fold case and accents, and spell out "&", so phrases and text compare on the same words
+def normalize_word(word):
+    if word == "&":
+        return "and"
+    return unicodedata.normalize("NFKD", word).encode("ascii", "ignore").decode().casefold()
+
+# Function to split text into normalized words, with the character span each one came from
+def tokenize(text):
+    text = str(text)
+    tokens = []
+    previous_end = 0
+    for match in WORD_PATTERN.finditer(text):
+        word = normalize_word(match.group())
+        if not word:
+            continue
+        # A None token marks a break that no phrase can match across
+        if tokens and BREAK_PATTERN.search(text, previous_end, match.start()):
+            tokens.append((None, previous_end, match.start()))
+        tokens.append((word, match.start(), match.end()))
+        previous_end = match.end()
+    return tokens
+
+# Function to reduce a dictionary phrase to its normalized words, ignoring any breaks inside it
+def phrase_words(phrase):
+    return tuple(word for word, _, _ in tokenize(phrase) if word is not None)
+
+# Aho-Corasick automaton over whole words, so a phrase only ever matches on word boundaries
+class PhraseAutomaton:
+    def __init__(self, fold=None):
+        # Extra per-word normalization applied to phrases and text alike
+        self.fold = fold or (lambda word: word)
+        self.goto = [{}]
+        self.fail = [0]
+        # Value of the phrase ending at a node, and its length in words
+        self.values = [None]
+        self.lengths = [0]
+        # Nearest node on the fail chain that ends a phrase, so matches are reported without walking every link
+        self.output = [0]
+        self.built = False
+
+    # Function to add a phrase, keeping the first value when the same phrase is added twice
+    def add(self, phrase, value):
+        words = [self.fold(word) for word in phrase_words(phrase)]
+        if not words:
+            return False
+        node = 0
+        for word in words:
+            child = self.goto[node].get(word)
+            if child is None:
+                child = len(self.goto)
+                self.goto[node][word] = child
+                self.goto.append({})
+                self.fail.append(0)
+                self.values.append(None)
+                self.lengths.append(0)
+                self.output.append(0)
+            node = child
+        if self.values[node] is not None:
+            return False
+        self.values[node] = value
+        self.lengths[node] = len(words)
+        self.built = False
+        return True
+
+    # Function to compute the fail and output links breadth first
+    def build(self):
+        queue = deque(self.goto[0].values())
+        for child in queue:
+            self.fail[child] = 0
+            self.output[child] = 0
+        while queue:
+            node = queue.popleft()
+            for word, child in self.goto[node].items():
+                fallback = self.fail[node]
+                while fallback and word not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(word, 0)
+                target = self.fail[child]
+                self.output[child] = target if self.values[target] is not None else self.output[target]
+                queue.append(child)
+        self.built = True
+
+    # Function to report every phrase occurrence as (first word, last word, value), in one pass over the words
+    def iter_matches(self, words):
+        if not self.built:
+            self.build()
+        node = 0
+        for position, word in enumerate(words):
+            while node and word not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(word, 0)
+            hit = node if self.values[node] is not None else self.output[node]
+            while hit:
+                yield position - self.lengths[hit] + 1, position, self.values[hit]
+                hit = self.output[hit]
+
+    # Function to find the leftmost-longest, non-overlapping phrases in a text as (start, end, value) spans
+    def find(self, text):
+        tokens = tokenize(text)
+        words = [word if word is None else self.fold(word) for word, _, _ in tokens]
+        matches = sorted(self.iter_matches(words), key=lambda m: (m[0], m[0] - m[1]))
+        found = []
+        covered = -1
+        for first, last, value in matches:
+            if first > covered:
+                found.append((tokens[first][1], tokens[last][2], value))
+                covered = last
+        return found
@@ -0,0 +1,86 @@
+from collections import OrderedDict
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+import streamlit as st
+
+# Response cache settings, overridable from the [response_cache] secrets section
+CACHE_SETTINGS = st.secrets.get("response_cache", {})
+CACHE_ENABLED = CACHE_SETTINGS.get("enabled", True)
+CACHE_PATH = CACHE_SETTINGS.get("path", "response_cache.sqlite")
+CACHE_MAX_ENTRIES = CACHE_SETTINGS.get("max_entries", 256)
+CACHE_TTL_SECONDS = CACHE_SETTINGS.get("ttl_seconds", 7 * 24 * 3600)
+
+# Function to normalize query text so trivially different wordings share a cache key
+def normalize_query(query):
+    query = re.sub(r"\s+", " ", query.lower()).strip()
+    return query.rstrip("?!. ")
+
+# Function to build the cache key for a query and model
+def cache_key(query, model_name):
+    return hashlib.sha256(f"{model_name}\n{normalize_query(query)}".encode()).hexdigest()
+
+class ResponseCache:
+    def __init__(self, path=CACHE_PATH, max_entries=CACHE_MAX_ENTRIES, ttl_seconds=CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.memory = OrderedDict()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, model TEXT, query TEXT, response TEXT, created_at REAL)"
+        )
+        self.db.commit()
+
+    # Function to look up a cached response, or None when missing or expired
+    def get(self, query, model_name):
+        key = cache_key(query, model_name)
+        now = time.time()
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry and now - entry[1] < self.ttl_seconds:
+                self.memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return entry[0]
+
+            row = self.db.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row and now - row[1] < self.ttl_seconds:
+                self.remember(key, row[0], row[1])
+                self.stats["disk_hits"] += 1
+                return row[0]
+
+            # Expired entries are dropped from both tiers
+            if entry or row:
+                self.memory.pop(key, None)
+                self.db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.db.commit()
+            self.stats["misses"] += 1
+            return None
+
+    # Function to store a response in both tiers
+    def put(self, query, model_name, response):
+        key = cache_key(query, model_name)
+        now = time.time()
+        with self.lock:
+            self.remember(key, response, now)
+            self.db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                (key, model_name, normalize_query(query), response, now),
+            )
+            self.db.commit()
+
+    # Function to add an entry to the in-memory LRU, evicting the least recently used
+    def remember(self, key, response, created_at):
+        self.memory[key] = (response, created_at)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+# Function to get the response cache shared by every session in this process
+@st.cache_resource(show_spinner=False)
+def get_response_cache():
+    return ResponseCache()
@@ -0,0 +1,313 @@
+from bisect import bisect_right
+from collections import Counter, defaultdict, namedtuple
+import re
+import streamlit as st
+from rapidfuzz import process, fuzz, utils
+from ipeds_snapshot import load_hd_snapshot, SNAPSHOT_YEAR
+from lazy_imports import lazy_module
+from phrase_automaton import PhraseAutomaton, phrase_words
+
+np = lazy_module("numpy")
+
+SchoolMatch = namedtuple("SchoolMatch", ["query", "name", "unitid", "score"])
+
+# Sub-schools and informal names Gemini uses, mapped to the parent IPEDS institution
+PARENT_SCHOOLS = {
+    "NYU": "New York University",
+    "NYU Stern": "New York University",
+    "Stern School of Business": "New York University",
+    "Columbia Business School": "Columbia University in the City of New York",
+    "Columbia Law School": "Columbia University in the City of New York",
+    "Wharton School": "University of Pennsylvania",
+    "Harvard Business School": "Harvard University",
+    "Harvard Law School": "Harvard University",
+    "Stanford Graduate School of Business": "Stanford University",
+    "MIT Sloan": "Massachusetts Institute of Technology",
+    "Kellogg School of Management": "Northwestern University",
+    "Booth School of Business": "University of Chicago",
+    "Tuck School of Business": "Dartmouth College",
+    "SUNY at Buffalo": "University at Buffalo",
+    "SUNY Buffalo": "University at Buffalo",
+    "SUNY at Albany": "University at Albany",
+    "SUNY Stony Brook": "Stony Brook University",
+    "SUNY at Stony Brook": "Stony Brook University",
+    "SUNY Binghamton": "Binghamton University",
+    "SUNY at Binghamton": "Binghamton University",
+    "CUNY Baruch": "CUNY Bernard M Baruch College",
+    "UConn": "University of Connecticut",
+}
+
+# Trailing sub-school phrases that can be dropped to reach the parent institution
+SUBSCHOOL_PATTERN = re.compile(
+    r"\s*(?:-|,)?\s*(?:(?:Graduate\s+)?School|College)\s+of\s+(?:Business|Management|Law|Medicine|Nursing|Engineering|"
+    r"Education|Public\s+Health|Social\s+Work|Dentistry|Pharmacy|Architecture|Journalism)\b.*$"
+    r"|\s+(?:Business|Law|Medical|Nursing)\s+School\b.*$",
+    re.IGNORECASE,
+)
+
+# Capitalized names ending in University, College or Institute, with an optional "of ..." tail, on one line
+# Both runs of words are bounded, so a long stretch of capitalized text is scanned in linear time
+NAME_WORD = r"(?:St\.|[A-Z][\w'&-]*)"
+MAX_NAME_WORDS = 8
+SCHOOL_NAME_PATTERN = re.compile(
+    rf"\b(?:{NAME_WORD}[ \t]+){{0,{MAX_NAME_WORDS}}}(?:University|College|Institute)\b"
+    rf"(?:[ \t]+(?:of|at|for|in)(?:[ \t]+the)?(?:[ \t]+(?:{NAME_WORD}|&)){{0,{MAX_NAME_WORDS}}}[ \t]+{NAME_WORD})?"
+)
+
+# Words that make an alias read as a school rather than a place, like "New Brunswick" or "Grand Valley"
+SCHOOL_WORDS = {"university", "college", "institute", "school", "academy", "seminary", "conservatory", "polytechnic",
+                "tech"}
+
+# Words a school name can drop without naming a different school
+OPTIONAL_WORDS = {"the", "of", "at", "and", "in"}
+
+# Share of a query's trigrams a candidate must contain to be scored at all
+MIN_SHARED_GRAMS = 0.4
+
+# Function to normalize a school name the way token_sort_ratio compares it
+def normalize_name(name):
+    tokens = utils.default_process(str(name).replace("&", " and ")).split()
+    return " ".join(sorted(tokens))
+
+# Function to strip the campus from a name, as "Rutgers University-New Brunswick" is usually written
+def campus_less(name):
+    return str(name).split("-")[0]
+
+# Function to list the words a query must contain to name an institution: its name without filler words
+def distinctive_words(name):
+    return [word for word in normalize_name(name).split() if word not in OPTIONAL_WORDS]
+
+# Function to check that a query contains every distinctive word of a name, allowing typos and abbreviations like "Univ"
+def covers_words(query_key, words):
+    query_words = query_key.split()
+    return all(
+        any(word.startswith(query_word) if len(query_word) >= 3 else word == query_word for query_word in query_words)
+        or any(fuzz.ratio(query_word, word) >= 80 for query_word in query_words)
+        for word in words
+    )
+
+# Function to split a normalized name into padded character trigrams
+def name_trigrams(key):
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+# Function to normalize a state code or city name for comparison, or None when it is missing
+def normalize_place(place):
+    return (place.strip().casefold() or None) if isinstance(place, str) else None
+
+class SchoolMatchIndex:
+    def __init__(self, names, unitids, aliases=(), states=(), cities=()):
+        self.names = list(names)
+        self.unitids = list(unitids)
+        self.keys = [normalize_name(name) for name in self.names]
+        # The campus may be left out unless several rows share the rest of the name, like the Rutgers campuses
+        shared = Counter(normalize_name(campus_less(name)) for name in self.names)
+        self.words = [distinctive_words(name if shared[normalize_name(campus_less(name))] > 1 else campus_less(name))
+                      for name in self.names]
+        self.aliases = build_alias_index(self.names, self.keys, aliases)
+        self.states = [normalize_place(state) for state in states] or [None] * len(self.names)
+        self.cities = [normalize_place(city) for city in cities] or [None] * len(self.names)
+
+        # Inverted index from trigram to the rows whose name contains it
+        postings = defaultdict(list)
+        for row, key in enumerate(self.keys):
+            for gram in name_trigrams(key):
+                postings[gram].append(row)
+        self.postings = {gram: np.array(rows, dtype=np.int32) for gram, rows in postings.items()}
+
+    # Function to collect the rows that share enough trigrams with any of the queries
+    def candidates(self, query_keys):
+        found = set()
+        for key in query_keys:
+            grams = [self.postings[gram] for gram in name_trigrams(key) if gram in self.postings]
+            if not grams:
+                continue
+            counts = np.bincount(np.concatenate(grams), minlength=len(self.keys))
+            needed = max(1, int(len(name_trigrams(key)) * MIN_SHARED_GRAMS))
+            found.update(np.flatnonzero(counts >= needed).tolist())
+        return sorted(found)
+
+    # Function to resolve a name through the alias hash before any fuzzy scoring
+    def resolve_alias(self, school):
+        row = self.aliases.get(normalize_name(school))
+        if row is None:
+            parent = SUBSCHOOL_PATTERN.sub("", school)
+            if parent != school:
+                row = self.aliases.get(normalize_name(parent))
+        return row
+
+    # Function to match every school, resolving aliases first and fuzzy scoring the rest in one pass
+    # A state given for a school rules out candidates elsewhere, and a city given with it is preferred within the state
+    def match(self, schools, score_cutoff=80, states=None, cities=None):
+        states = [normalize_place(state) for state in states or [None] * len(schools)]
+        cities = [normalize_place(city) for city in cities or [None] * len(schools)]
+        matches = [None] * len(schools)
+        pending = []
+        for i, school in enumerate(schools):
+            row = self.resolve_alias(school)
+            if row is not None and states[i] in (None, self.states[row]):
+                matches[i] = SchoolMatch(school, self.names[row], self.unitids[row], 100.0)
+            else:
+                pending.append(i)
+
+        # Sub-school suffixes only hurt the fuzzy score, so they are dropped before scoring too
+        query_keys = [normalize_name(SUBSCHOOL_PATTERN.sub("", schools[i]) or schools[i]) for i in pending]
+        rows = self.candidates(query_keys)
+        if not rows:
+            return matches
+
+        scores = process.cdist(query_keys, [self.keys[row] for row in rows], scorer=fuzz.ratio,
+                               processor=None, score_cutoff=score_cutoff, workers=-1)
+        row_states = np.array([self.states[row] for row in rows], dtype=object)
+        row_cities = np.array([self.cities[row] for row in rows], dtype=object)
+        for j, i in enumerate(pending):
+            if states[i] is not None:
+                scores[j, row_states != states[i]] = 0
+                in_city = (row_cities == cities[i]) & (scores[j] > 0)
+                if cities[i] is not None and in_city.any():
+                    scores[j, ~in_city] = 0
+            # Names differing in one distinctive word, like "Ohio State" and "Iowa State", still score high,
+            # so the best candidate whose every distinctive word the query contains wins
+            for k in np.argsort(-scores[j], kind="stable"):
+                if not scores[j, k]:
+                    break
+                row = rows[k]
+                if covers_words(query_keys[j], self.words[row]):
+                    matches[i] = SchoolMatch(schools[i], self.names[row], self.unitids[row], float(scores[j, k]))
+                    break
+        return matches
+
+# Function to split an IPEDS alias field, free text separated by "|", "," or ";", into single aliases
+def split_aliases(alias_text):
+    if not isinstance(alias_text, str):
+        return []
+    return re.split(r"[|,;]", re.sub(r"\(.*?\)", "", alias_text))
+
+# Function to pick the row a name shared by several rows stands for: the only one, or else the only main campus
+def shared_name_row(rows, names):
+    if len(rows) > 1:
+        # "Ohio State University" is shared by every Ohio State campus, and means the main one
+        rows = {row for row in rows if "main campus" in names[row].lower()}
+    return next(iter(rows)) if len(rows) == 1 else None
+
+# Function to build the hash index from normalized names, campus-less names and aliases to IPEDS rows
+def build_alias_index(names, keys, aliases):
+    index = {}
+    for row, key in enumerate(keys):
+        index.setdefault(key, row)
+
+    # The same campus-less name or alias may belong to several institutions
+    alias_rows = defaultdict(set)
+    for row, (name, alias_text) in enumerate(zip(names, aliases)):
+        for alias in [campus_less(name)] + split_aliases(alias_text):
+            alias_key = normalize_name(alias)
+            if len(alias_key) >= 3:
+                alias_rows[alias_key].add(row)
+    for alias_key, rows in alias_rows.items():
+        row = shared_name_row(rows, names)
+        if row is not None and alias_key not in index:
+            index[alias_key] = row
+
+    for alias, parent in PARENT_SCHOOLS.items():
+        row = index.get(normalize_name(parent))
+        if row is not None:
+            index[normalize_name(alias)] = row
+    return index
+
+# Function to list the phrases that name an institution in prose: its name, campus-less and "The"-less forms, aliases
+def name_phrases(name, alias_text):
+    phrases = [name]
+    if name.lower().startswith("the "):
+        phrases.append(name[4:])
+    if "-" in name:
+        phrases.append(campus_less(name))
+    # Other IPEDS aliases are often bare places or common words, like "New Brunswick", which misfire in prose
+    phrases.extend(alias for alias in split_aliases(alias_text)
+                   if len(phrase_words(alias)) >= 2 and SCHOOL_WORDS & set(phrase_words(alias)))
+    return phrases
+
+class SchoolExtractor:
+    def __init__(self, names, unitids, aliases=()):
+        names, unitids, aliases = list(names), list(unitids), list(aliases) or [None] * len(names)
+        self.automaton = PhraseAutomaton()
+
+        # Official names come first, then other phrases that point at a single institution only
+        phrase_rows = defaultdict(set)
+        for row, (name, alias_text) in enumerate(zip(names, aliases)):
+            self.automaton.add(name, row)
+            for phrase in name_phrases(name, alias_text)[1:]:
+                phrase_rows[phrase_words(phrase)].add(row)
+        for words, rows in phrase_rows.items():
+            row = shared_name_row(rows, names)
+            if row is not None:
+                self.automaton.add(" ".join(words), row)
+        for alias, parent in PARENT_SCHOOLS.items():
+            if parent in names:
+                self.automaton.add(alias, names.index(parent))
+        self.automaton.build()
+        self.vocabulary = {word for name in names for word in phrase_words(name)}
+        self.names = names
+        self.unitids = unitids
+
+    # Function to find school names the automaton could not place, as (start, end) spans outside the placed ones
+    def unplaced_names(self, text, placed):
+        # Placed spans never overlap, so their ends are sorted and the one a name could overlap is found by bisection
+        placed_ends = [end for _, end, _ in placed]
+        spans = []
+        for match in SCHOOL_NAME_PATTERN.finditer(text):
+            start, end = match.span()
+            words = list(re.finditer(r"\S+", match.group()))
+            # Leading words no institution uses, like "Consider" or "The", start the sentence rather than the name
+            while len(words) > 2 and not set(phrase_words(words[0].group())) <= self.vocabulary - {"the"}:
+                words.pop(0)
+            start += words[0].start()
+            i = bisect_right(placed_ends, start)
+            if len(words) >= 2 and not (i < len(placed) and placed[i][0] < end):
+                spans.append((start, end))
+        return spans
+
+    # Function to find every institution named in a text in order of first mention, keeping unplaced names as given
+    def extract(self, text):
+        placed = self.automaton.find(text)
+        spans = placed + [(start, end, None) for start, end in self.unplaced_names(text, placed)]
+        matches = {}
+        for start, end, row in sorted(spans):
+            if row is None:
+                # Names shared by several campuses, or missing from IPEDS, are listed without a unitid
+                name = " ".join(text[start:end].split())
+                matches.setdefault(normalize_name(name), SchoolMatch(name, name, None, 0.0))
+            elif self.unitids[row] not in matches:
+                matches[self.unitids[row]] = SchoolMatch(text[start:end], self.names[row], self.unitids[row], 100.0)
+        return list(matches.values())
+
+# Function to build the name extractor once per process from the IPEDS snapshot
+@st.cache_resource(show_spinner=False)
+def get_school_extractor(year=SNAPSHOT_YEAR):
+    df = load_hd_snapshot(year)
+    return SchoolExtractor(df['instnm'], df['unitid'], df['ialias'])
+
+# Function to build the match index once per process from the IPEDS snapshot
+@st.cache_resource(show_spinner=False)
+def get_match_index(year=SNAPSHOT_YEAR):
+    df = load_hd_snapshot(year)
+    return SchoolMatchIndex(df['instnm'], df['unitid'], df['ialias'], df['stabbr'], df['city'])
+
+# Function to map the institutions Gemini listed to canonical IPEDS names, keeping any it cannot place as given
+def resolve_institution_names(institutions, year=SNAPSHOT_YEAR):
+    names = [institution["name"] for institution in institutions]
+    # The state and city Gemini gave rule out same-sounding schools elsewhere, such as Iowa State for Ohio State
+    states = [institution.get("state") for institution in institutions]
+    cities = [institution.get("city") for institution in institutions]
+    matches = get_match_index(year).match(names, states=states, cities=cities)
+    return list(dict.fromkeys(match.name if match else name for match, name in zip(matches, names)))
+
+# Function to pair each school name with its unitid, or with the name itself when IPEDS has no exact entry for it
+def school_choices(names, year=SNAPSHOT_YEAR):
+    if not names:
+        return []
+    index = get_match_index(year)
+    choices = []
+    for name in names:
+        row = index.resolve_alias(name)
+        choices.append((int(index.unitids[row]) if row is not None else name, name))
+    return choices
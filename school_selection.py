@@ -0,0 +1,36 @@
+import streamlit as st
+
+# The schools a session has picked: an ordered set keyed by unitid, remembering each school's display name
+class SchoolSelection:
+    def __init__(self, choices=()):
+        self.schools = dict(choices)
+
+    def __contains__(self, key):
+        return key in self.schools
+
+    def __len__(self):
+        return len(self.schools)
+
+    # Function to apply one batch of checkbox states for the schools that were on screen
+    def apply(self, choices, checked_keys):
+        checked_keys = set(checked_keys)
+        for key, name in choices:
+            if key in checked_keys:
+                self.schools.setdefault(key, name)
+            else:
+                self.schools.pop(key, None)
+
+    # Function to list the selected school names in the order they were picked
+    def names(self):
+        return list(self.schools.values())
+
+# Function to render one checkbox per school inside the current form, returning the keys that are ticked
+def school_checkboxes(choices, selection):
+    # A checkbox's identity includes its default, so defaults stay frozen while the same schools are on screen;
+    # otherwise every submit would recreate the ticked boxes and drop the next batch of toggles
+    shown = (tuple(key for key, _ in choices), id(selection))
+    defaults = st.session_state.get('_school_checkbox_defaults')
+    if defaults is None or defaults[0] != shown:
+        defaults = (shown, frozenset(key for key, _ in choices if key in selection))
+        st.session_state['_school_checkbox_defaults'] = defaults
+    return [key for key, name in choices if st.checkbox(name, value=key in defaults[1])]
@@ -0,0 +1,134 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import logging
+import math
+import streamlit as st
+from lazy_imports import lazy_module
+from metrics import count, timed
+from scorecard_cache import SCORECARD_CACHE_ENABLED, get_scorecard_cache
+from scorecard_mirror import get_scorecard_mirror
+
+pd = lazy_module("pandas")
+requests = lazy_module("requests")
+
+logger = logging.getLogger(__name__)
+
+# College Scorecard settings, overridable from the [college_scorecard] secrets section
+SCORECARD_SETTINGS = st.secrets.get("college_scorecard", {})
+college_scorecard_api_key = SCORECARD_SETTINGS.get("api_key", None)
+SCORECARD_URL = 'https://api.data.gov/ed/collegescorecard/v1/schools'
+SCORECARD_FIELDS = 'school.name,school.city,school.state,latest.admissions.admission_rate.overall'
+PER_PAGE = SCORECARD_SETTINGS.get("per_page", 100)
+MAX_PAGES = SCORECARD_SETTINGS.get("max_pages", 20)
+MAX_CONCURRENT_PAGES = SCORECARD_SETTINGS.get("max_concurrent_pages", 4)
+REQUEST_TIMEOUT = SCORECARD_SETTINGS.get("timeout_seconds", 10)
+# Detail lookups send this many unitids per request, so each batch normally fits in one page
+ID_BATCH_SIZE = SCORECARD_SETTINGS.get("id_batch_size", PER_PAGE)
+DETAIL_FIELDS = (
+    'id,school.name,school.city,school.state,school.school_url,latest.admissions.admission_rate.overall,'
+    'latest.cost.tuition.in_state,latest.cost.tuition.out_of_state,latest.student.size'
+)
+
+# Function to get the pooled HTTP session shared by every session in this process
+@st.cache_resource(show_spinner=False)
+def get_scorecard_session():
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=MAX_CONCURRENT_PAGES)
+    session.mount("https://", adapter)
+    return session
+
+# Function to fetch one results page, raising requests.RequestException on failure
+def fetch_page(params, page):
+    response = get_scorecard_session().get(
+        SCORECARD_URL, params={**params, 'page': page, 'per_page': PER_PAGE}, timeout=REQUEST_TIMEOUT
+    )
+    count("scorecard_requests")
+    response.raise_for_status()
+    return response.json()
+
+# Function to stream every results page for a query, fetching the pages after the first concurrently
+def iter_scorecard_pages(params):
+    params = {'api_key': college_scorecard_api_key, **params}
+    first = fetch_page(params, 0)
+    yield first.get('results', [])
+
+    total = first.get('metadata', {}).get('total', 0)
+    pages = min(math.ceil(total / PER_PAGE), MAX_PAGES)
+    if total > MAX_PAGES * PER_PAGE:
+        count("scorecard_truncated_searches")
+        logger.warning("College Scorecard search has %d results, only the first %d are fetched (max_pages=%d)",
+                       total, MAX_PAGES * PER_PAGE, MAX_PAGES)
+    if pages <= 1:
+        return
+    with ThreadPoolExecutor(max_workers=min(MAX_CONCURRENT_PAGES, pages - 1)) as executor:
+        futures = [executor.submit(fetch_page, params, page) for page in range(1, pages)]
+        # Pages are handed over as soon as each one arrives, not in page order
+        for future in as_completed(futures):
+            yield future.result().get('results', [])
+
+# Function to stream College Scorecard results for a state and name keyword, one page at a time
+def iter_college_data(state, keyword, fields=SCORECARD_FIELDS):
+    yield from iter_scorecard_pages({'school.state': state, 'school.name': keyword, 'fields': fields})
+
+# Function to download every result for a search, or None when any page failed
+def download_college_data(state, keyword, fields=SCORECARD_FIELDS):
+    results = []
+    try:
+        for page in iter_college_data(state, keyword, fields):
+            results.extend(page)
+    except requests.RequestException as e:
+        logger.warning("College Scorecard lookup failed for %s/%s: %s", state, keyword, e)
+        return None
+    return results
+
+# Function to fetch data from the College Scorecard API, serving repeat searches from the cache
+@timed("fetch_college_data")
+def fetch_college_data(state, keyword, fields=SCORECARD_FIELDS):
+    # A local mirror answers every search without any outbound traffic
+    mirror = get_scorecard_mirror()
+    if mirror is not None:
+        return mirror.search(state, keyword, fields)
+    if not SCORECARD_CACHE_ENABLED:
+        return download_college_data(state, keyword, fields) or []
+
+    cache = get_scorecard_cache()
+    cached, is_stale = cache.get(state, keyword, fields)
+    if cached is not None:
+        count("scorecard_cache_hits")
+        # A stale answer is still served at once while a fresh copy is fetched behind it
+        if is_stale:
+            cache.revalidate(state, keyword, fields, lambda: download_college_data(state, keyword, fields))
+        return cached
+
+    results = download_college_data(state, keyword, fields)
+    if results is None:
+        return []
+    cache.put(state, keyword, fields, results)
+    return results
+
+# Function to download the details for one batch of unitids, or an empty list when the batch failed
+def download_college_details(unitids, fields):
+    results = []
+    try:
+        for page in iter_scorecard_pages({'id': ','.join(str(unitid) for unitid in unitids), 'fields': fields}):
+            results.extend(page)
+    except requests.RequestException as e:
+        logger.warning("College Scorecard detail lookup failed for %d schools: %s", len(unitids), e)
+    return results
+
+# Function to fetch Scorecard details for many schools at once as one table keyed by unitid
+@timed("fetch_college_details")
+def fetch_college_details(unitids, fields=DETAIL_FIELDS):
+    unitids = sorted({int(unitid) for unitid in unitids})
+    if not unitids:
+        return pd.DataFrame({'unitid': pd.Series(dtype='int64')})
+    mirror = get_scorecard_mirror()
+    if mirror is not None:
+        results = mirror.details(unitids, fields)
+    else:
+        batches = [unitids[i:i + ID_BATCH_SIZE] for i in range(0, len(unitids), ID_BATCH_SIZE)]
+        results = []
+        with ThreadPoolExecutor(max_workers=min(MAX_CONCURRENT_PAGES, len(batches))) as executor:
+            for batch_results in executor.map(lambda batch: download_college_details(batch, fields), batches):
+                results.extend(batch_results)
+    details = pd.DataFrame(results, columns=fields.split(','))
+    return details.rename(columns={'id': 'unitid'}).astype({'unitid': 'int64'})
@@ -0,0 +1,115 @@
+from collections import OrderedDict
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import streamlit as st
+
+# Scorecard cache settings, overridable from the [scorecard_cache] secrets section
+SCORECARD_CACHE_SETTINGS = st.secrets.get("scorecard_cache", {})
+SCORECARD_CACHE_ENABLED = SCORECARD_CACHE_SETTINGS.get("enabled", True)
+SCORECARD_CACHE_PATH = SCORECARD_CACHE_SETTINGS.get("path", "scorecard_cache.sqlite")
+SCORECARD_CACHE_MAX_ENTRIES = SCORECARD_CACHE_SETTINGS.get("max_entries", 512)
+# Scorecard data is republished yearly, so entries stay fresh for a month and may be served stale for a year
+SCORECARD_CACHE_TTL_SECONDS = SCORECARD_CACHE_SETTINGS.get("ttl_seconds", 30 * 24 * 3600)
+SCORECARD_CACHE_STALE_SECONDS = SCORECARD_CACHE_SETTINGS.get("stale_seconds", 365 * 24 * 3600)
+
+# Function to build the cache key for a search and its field projection
+def lookup_key(state, keyword, fields):
+    state = (state or "").strip().upper()
+    keyword = " ".join((keyword or "").lower().split())
+    fields = ",".join(sorted(field.strip() for field in fields.split(",")))
+    return hashlib.sha256(f"{state}\n{keyword}\n{fields}".encode()).hexdigest()
+
+class ScorecardCache:
+    def __init__(self, path=SCORECARD_CACHE_PATH, max_entries=SCORECARD_CACHE_MAX_ENTRIES,
+                 ttl_seconds=SCORECARD_CACHE_TTL_SECONDS, stale_seconds=SCORECARD_CACHE_STALE_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self.memory = OrderedDict()
+        self.refreshing = set()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "stale_hits": 0, "misses": 0}
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS lookups ("
+            "key TEXT PRIMARY KEY, state TEXT, keyword TEXT, fields TEXT, results TEXT, created_at REAL)"
+        )
+        self.db.commit()
+
+    # Function to look up cached results as (results, is_stale), or (None, False) when missing or too old
+    def get(self, state, keyword, fields):
+        key = lookup_key(state, keyword, fields)
+        now = time.time()
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is None:
+                row = self.db.execute("SELECT results, created_at FROM lookups WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    entry = (json.loads(row[0]), row[1])
+                    self.remember(key, *entry)
+                    self.stats["disk_hits"] += 1
+            else:
+                self.memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+
+            if entry is None:
+                self.stats["misses"] += 1
+                return None, False
+            age = now - entry[1]
+            if age < self.ttl_seconds:
+                return entry[0], False
+            if age < self.ttl_seconds + self.stale_seconds:
+                self.stats["stale_hits"] += 1
+                return entry[0], True
+
+            # Entries past the stale window are dropped from both tiers
+            self.memory.pop(key, None)
+            self.db.execute("DELETE FROM lookups WHERE key = ?", (key,))
+            self.db.commit()
+            self.stats["misses"] += 1
+            return None, False
+
+    # Function to store results in both tiers
+    def put(self, state, keyword, fields, results):
+        key = lookup_key(state, keyword, fields)
+        now = time.time()
+        with self.lock:
+            self.remember(key, results, now)
+            self.db.execute(
+                "INSERT OR REPLACE INTO lookups VALUES (?, ?, ?, ?, ?, ?)",
+                (key, state, keyword, fields, json.dumps(results), now),
+            )
+            self.db.commit()
+
+    # Function to add an entry to the in-memory LRU, evicting the least recently used
+    def remember(self, key, results, created_at):
+        self.memory[key] = (results, created_at)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+    # Function to refresh a stale entry in the background, at most once at a time per key
+    def revalidate(self, state, keyword, fields, fetch):
+        key = lookup_key(state, keyword, fields)
+        with self.lock:
+            if key in self.refreshing:
+                return
+            self.refreshing.add(key)
+
+        def refresh():
+            try:
+                results = fetch()
+                if results is not None:
+                    self.put(state, keyword, fields, results)
+            finally:
+                with self.lock:
+                    self.refreshing.discard(key)
+        threading.Thread(target=refresh, daemon=True).start()
+
+# Function to get the Scorecard cache shared by every session in this process
+@st.cache_resource(show_spinner=False)
+def get_scorecard_cache():
+    return ScorecardCache()
@@ -0,0 +1,118 @@
+import argparse
+import os
+import re
+import sqlite3
+import threading
+import streamlit as st
+from lazy_imports import lazy_module
+
+pd = lazy_module("pandas")
+
+# Offline Scorecard mirror settings, overridable from the [scorecard_mirror] secrets section
+MIRROR_SETTINGS = st.secrets.get("scorecard_mirror", {})
+MIRROR_ENABLED = MIRROR_SETTINGS.get("enabled", False)
+MIRROR_PATH = MIRROR_SETTINGS.get("path", "scorecard_mirror.sqlite")
+CSV_CHUNK_ROWS = 2000
+
+# Bulk CSV column -> (mirror column, API field name), see the Scorecard data dictionary
+COLUMNS = {
+    "UNITID": ("unitid", "id"),
+    "INSTNM": ("name", "school.name"),
+    "CITY": ("city", "school.city"),
+    "STABBR": ("state", "school.state"),
+    "INSTURL": ("school_url", "school.school_url"),
+    "ADM_RATE": ("admission_rate", "latest.admissions.admission_rate.overall"),
+    "TUITIONFEE_IN": ("tuition_in_state", "latest.cost.tuition.in_state"),
+    "TUITIONFEE_OUT": ("tuition_out_of_state", "latest.cost.tuition.out_of_state"),
+    "UGDS": ("student_size", "latest.student.size"),
+}
+NUMERIC_COLUMNS = {"ADM_RATE", "TUITIONFEE_IN", "TUITIONFEE_OUT", "UGDS"}
+FIELD_COLUMNS = {field: column for column, field in COLUMNS.values()}
+
+# Function to load the published bulk CSV into a new mirror database, replacing the old one atomically
+def ingest_csv(csv_path, db_path=MIRROR_PATH):
+    tmp_path = f"{db_path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    db = sqlite3.connect(tmp_path)
+    columns = [column for column, _ in COLUMNS.values()]
+    db.execute(
+        "CREATE TABLE schools (unitid INTEGER PRIMARY KEY, name TEXT, city TEXT, state TEXT, school_url TEXT, "
+        "admission_rate REAL, tuition_in_state REAL, tuition_out_of_state REAL, student_size REAL)"
+    )
+    rows = 0
+    # The bulk file has thousands of columns, so only the mirrored ones are parsed, a chunk at a time
+    for chunk in pd.read_csv(csv_path, usecols=list(COLUMNS), dtype=str, chunksize=CSV_CHUNK_ROWS,
+                             keep_default_na=True, na_values=["NULL", "PrivacySuppressed"]):
+        for column in NUMERIC_COLUMNS:
+            chunk[column] = pd.to_numeric(chunk[column], errors="coerce")
+        chunk = chunk.astype(object).where(chunk.notna(), None)
+        db.executemany(
+            f"INSERT OR REPLACE INTO schools VALUES ({', '.join('?' for _ in columns)})",
+            chunk[list(COLUMNS)].itertuples(index=False, name=None),
+        )
+        rows += len(chunk)
+    db.execute("CREATE INDEX schools_state ON schools (state)")
+    db.execute("CREATE INDEX schools_admission_rate ON schools (admission_rate)")
+    db.execute("CREATE VIRTUAL TABLE schools_fts USING fts5(name, content='schools', content_rowid='unitid')")
+    db.execute("INSERT INTO schools_fts (schools_fts) VALUES ('rebuild')")
+    db.commit()
+    db.execute("VACUUM")
+    db.close()
+    os.replace(tmp_path, db_path)
+    return rows
+
+# Function to turn a name keyword into an FTS5 query that matches every word as a prefix
+def fts_query(keyword):
+    return " ".join(f'"{word}"*' for word in re.findall(r"\w+", keyword.lower()))
+
+class ScorecardMirror:
+    def __init__(self, path=MIRROR_PATH):
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+
+    # Function to project mirror rows onto the requested API field names, as the live API returns them
+    def select(self, where, params, fields):
+        fields = fields.split(",")
+        columns = [FIELD_COLUMNS.get(field, "NULL") for field in fields]
+        sql = f"SELECT {', '.join(columns)} FROM schools WHERE {where} ORDER BY name"
+        with self.lock:
+            rows = self.db.execute(sql, params).fetchall()
+        return [dict(zip(fields, row)) for row in rows]
+
+    # Function to answer a (state, name keyword) search like the live schools endpoint
+    def search(self, state, keyword, fields):
+        clauses, params = [], []
+        if state:
+            clauses.append("state = ?")
+            params.append(state.strip().upper())
+        query = fts_query(keyword or "")
+        if query:
+            clauses.append("unitid IN (SELECT rowid FROM schools_fts WHERE schools_fts MATCH ?)")
+            params.append(query)
+        return self.select(" AND ".join(clauses) or "1", params, fields)
+
+    # Function to look up many schools by unitid
+    def details(self, unitids, fields):
+        unitids = [int(unitid) for unitid in unitids]
+        return self.select(f"unitid IN ({', '.join('?' for _ in unitids)})", unitids, fields) if unitids else []
+
+# Function to open one build of the mirror, shared by every session until the file is rebuilt
+@st.cache_resource(show_spinner=False)
+def open_scorecard_mirror(path, modified):
+    return ScorecardMirror(path)
+
+# Function to get the offline mirror, or None when it is off or not built yet
+def get_scorecard_mirror():
+    # The file is checked on every call, so a mirror built or rebuilt while the app runs is used without a restart
+    if not MIRROR_ENABLED or not os.path.exists(MIRROR_PATH):
+        return None
+    return open_scorecard_mirror(MIRROR_PATH, os.path.getmtime(MIRROR_PATH))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load the College Scorecard bulk CSV into the offline mirror")
+    parser.add_argument("csv", help="Most-Recent-Cohorts-Institution.csv from the Scorecard data download")
+    parser.add_argument("--dest", default=MIRROR_PATH, help="SQLite file for the mirror")
+    args = parser.parse_args()
+    rows = ingest_csv(args.csv, args.dest)
+    print(f"Loaded {rows} schools into {args.dest}")
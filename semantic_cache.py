@@ -0,0 +1,136 @@
+from datetime import datetime
+import glob
+import json
+import os
+import re
+import threading
+import time
+import zlib
+import streamlit as st
+from lazy_imports import lazy_module
+
+np = lazy_module("numpy")
+
+# Semantic cache settings, overridable from the [semantic_cache] secrets section
+SEMANTIC_SETTINGS = st.secrets.get("semantic_cache", {})
+# Off unless turned on, since a reworded question can still be a different question
+SEMANTIC_CACHE_ENABLED = SEMANTIC_SETTINGS.get("enabled", False)
+SIMILARITY_THRESHOLD = SEMANTIC_SETTINGS.get("threshold", 0.95)
+SEMANTIC_MAX_ENTRIES = SEMANTIC_SETTINGS.get("max_entries", 512)
+SEMANTIC_TTL_SECONDS = SEMANTIC_SETTINGS.get("ttl_seconds", 7 * 24 * 3600)
+HISTORY_GLOB = SEMANTIC_SETTINGS.get("history_glob", os.path.join("data", "conversation_*.json"))
+VECTOR_SIZE = 2 ** 12
+
+# Words that carry no meaning for matching college questions
+STOPWORDS = {
+    "a", "an", "and", "any", "are", "about", "at", "for", "good", "in", "is", "me", "more", "of", "on",
+    "some", "tell", "the", "to", "what", "which", "with",
+}
+
+# Function to split a query into normalized terms
+def query_terms(query):
+    return [word for word in re.findall(r"[a-z0-9]+", query.lower()) if word not in STOPWORDS]
+
+# Function to hash a term into a fixed-size vector slot
+def term_slot(term):
+    return zlib.crc32(term.encode()) % VECTOR_SIZE
+
+class SemanticCache:
+    def __init__(self, model_name, threshold=SIMILARITY_THRESHOLD, max_entries=SEMANTIC_MAX_ENTRIES,
+                 ttl_seconds=SEMANTIC_TTL_SECONDS):
+        # Answers from one model are never served for another, so each model gets its own cache
+        self.model_name = model_name
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.idf = np.ones(VECTOR_SIZE, dtype=np.float32)
+        # Rows are allocated once and reused oldest first, so adding an entry never copies the matrix
+        self.matrix = np.zeros((max_entries, VECTOR_SIZE), dtype=np.float32)
+        self.entries = [None] * max_entries
+        self.created_at = np.full(max_entries, -np.inf)
+        self.next_row = 0
+        self.stats = {"hits": 0, "misses": 0}
+        self.lock = threading.Lock()
+
+    # Function to vectorize a query as an L2-normalized hashed TF-IDF row
+    def vectorize(self, query):
+        vector = np.zeros(VECTOR_SIZE, dtype=np.float32)
+        for term in query_terms(query):
+            vector[term_slot(term)] += 1.0
+        vector *= self.idf
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    # Function to fit the IDF weights and store the newest entries
+    def fit(self, entries):
+        entries = sorted(entries, key=lambda entry: entry["created_at"])[-self.max_entries:]
+        document_counts = np.zeros(VECTOR_SIZE, dtype=np.float32)
+        for entry in entries:
+            for slot in {term_slot(term) for term in query_terms(entry["query"])}:
+                document_counts[slot] += 1
+        self.idf = np.log((1 + len(entries)) / (1 + document_counts)).astype(np.float32) + 1
+        with self.lock:
+            self.matrix[:] = 0
+            self.entries = [None] * self.max_entries
+            self.created_at[:] = -np.inf
+            self.next_row = 0
+            for entry in entries:
+                self.store(self.vectorize(entry["query"]), entry)
+
+    # Function to write an entry into the next row, replacing the oldest once the cache is full
+    def store(self, vector, entry):
+        self.matrix[self.next_row] = vector
+        self.entries[self.next_row] = entry
+        self.created_at[self.next_row] = entry["created_at"]
+        self.next_row = (self.next_row + 1) % self.max_entries
+
+    # Function to find the closest unexpired entry above the similarity threshold
+    def lookup(self, query):
+        vector = self.vectorize(query)
+        # Only the query's own terms can add to a dot product, so only their columns are read
+        slots = np.flatnonzero(vector)
+        oldest = time.time() - self.ttl_seconds
+        with self.lock:
+            similarities = self.matrix[:, slots] @ vector[slots]
+            similarities[self.created_at < oldest] = 0
+            best = int(similarities.argmax())
+            if not slots.size or similarities[best] < self.threshold:
+                self.stats["misses"] += 1
+                return None
+            self.stats["hits"] += 1
+            return dict(self.entries[best], similarity=float(similarities[best]))
+
+    # Function to add a freshly answered query to the cache
+    def add(self, query, response):
+        vector = self.vectorize(query)
+        if not vector.any():
+            return
+        with self.lock:
+            self.store(vector, {"query": query, "response": response, "created_at": time.time()})
+
+# Function to read cacheable query/response pairs, with their creation times, from stored conversation files
+def load_history_entries(pattern=HISTORY_GLOB):
+    entries = {}
+    for path in sorted(glob.glob(pattern)):
+        try:
+            with open(path) as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            continue
+        response = record.get("response") or record.get("response_text")
+        if record.get("query") and isinstance(response, str) and response:
+            try:
+                created_at = datetime.fromisoformat(record["timestamp"]).timestamp()
+            except (KeyError, TypeError, ValueError):
+                created_at = os.path.getmtime(path)
+            # Later files win, so each distinct query keeps its most recent answer
+            entries[record["query"]] = {"query": record["query"], "response": response, "created_at": created_at}
+    return list(entries.values())
+
+# Function to get the semantic cache for a model shared by every session, seeded from conversation history
+# The stored records do not say which model answered, so they are credited to the model the app runs now
+@st.cache_resource(show_spinner=False)
+def get_semantic_cache(model_name):
+    cache = SemanticCache(model_name)
+    cache.fit(load_history_entries())
+    return cache
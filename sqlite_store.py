@@ -0,0 +1,75 @@
+from datetime import datetime
+import json
+import sqlite3
+import threading
+
+class SQLiteStorage:
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        # WAL lets readers in other sessions and processes proceed while a write is in flight
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS conversations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp TEXT NOT NULL,
+                username TEXT,
+                query TEXT,
+                record TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS conversations_timestamp ON conversations (timestamp);
+            CREATE INDEX IF NOT EXISTS conversations_username ON conversations (username, timestamp);
+            CREATE TABLE IF NOT EXISTS profiles (
+                username TEXT PRIMARY KEY,
+                profile TEXT NOT NULL,
+                updated_at TEXT NOT NULL
+            );
+            """
+        )
+        self.db.commit()
+
+    # Function to append a conversation record
+    def save_conversation(self, history):
+        username = (history.get("form_data") or {}).get("username")
+        with self.lock:
+            self.db.execute(
+                "INSERT INTO conversations (timestamp, username, query, record) VALUES (?, ?, ?, ?)",
+                (history.get("timestamp") or datetime.now().isoformat(), username, history.get("query"),
+                 json.dumps(history)),
+            )
+            self.db.commit()
+
+    # Function to read conversation records in timestamp order, optionally for one user or time range
+    def load_conversations(self, username=None, since=None, until=None):
+        clauses, params = [], []
+        if username is not None:
+            clauses.append("username = ?")
+            params.append(username)
+        if since is not None:
+            clauses.append("timestamp >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("timestamp < ?")
+            params.append(until)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self.lock:
+            rows = self.db.execute(f"SELECT record FROM conversations {where} ORDER BY timestamp", params).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    # Function to read a profile, or None when it does not exist
+    def load_profile(self, username):
+        with self.lock:
+            row = self.db.execute("SELECT profile FROM profiles WHERE username = ?", (username,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    # Function to create or replace a profile
+    def save_profile(self, username, profile):
+        with self.lock:
+            self.db.execute(
+                "INSERT INTO profiles (username, profile, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(username) DO UPDATE SET profile = excluded.profile, updated_at = excluded.updated_at",
+                (username, json.dumps(profile), datetime.now().isoformat()),
+            )
+            self.db.commit()
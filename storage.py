@@ -0,0 +1,119 @@
+import atexit
+import copy
+import hashlib
+import json
+import logging
+import threading
+import streamlit as st
+from metrics import timed
+
+logger = logging.getLogger(__name__)
+
+# Storage settings, overridable from the [storage] secrets section
+STORAGE_SETTINGS = st.secrets.get("storage", {})
+STORAGE_BACKEND = STORAGE_SETTINGS.get("backend", "github")
+SQLITE_PATH = STORAGE_SETTINGS.get("sqlite_path", "collegechat.sqlite")
+# Profile changes made within this window of each other are written once
+PROFILE_DEBOUNCE_SECONDS = STORAGE_SETTINGS.get("profile_debounce_seconds", 3)
+
+# Function to get the configured storage backend, shared by every session in this process
+@st.cache_resource(show_spinner=False)
+def get_storage(backend=STORAGE_BACKEND):
+    if backend == "sqlite":
+        from sqlite_store import SQLiteStorage
+        return SQLiteStorage(SQLITE_PATH)
+    if backend == "log":
+        from conversation_log import LogStorage
+        return LogStorage(SQLITE_PATH)
+    if backend == "github":
+        from github_store import GitHubStorage
+        return GitHubStorage()
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+# Function to save conversation history through the configured backend
+@timed("save_conversation_history_to_github")
+def save_conversation_history_to_github(history):
+    try:
+        get_storage().save_conversation(history)
+    except Exception as e:
+        st.error(f"Failed to save conversation history: {e}")
+
+# Function to load user profile through the configured backend
+@timed("load_user_profile")
+def load_user_profile(username):
+    try:
+        return get_storage().load_profile(username)
+    except Exception:
+        return None
+
+# Function to save user profile through the configured backend
+@timed("save_user_profile")
+def save_user_profile(username, profile):
+    try:
+        get_storage().save_profile(username, profile)
+        return True
+    except Exception as e:
+        st.error(f"Failed to save profile: {e}")
+        return False
+
+# Function to hash a profile's content so unchanged profiles can be recognized
+def profile_hash(profile):
+    return hashlib.sha256(json.dumps(profile, sort_keys=True, default=str).encode()).hexdigest()
+
+class ProfileWriter:
+    def __init__(self, debounce_seconds=PROFILE_DEBOUNCE_SECONDS):
+        self.debounce_seconds = debounce_seconds
+        self.persisted = {}
+        self.timers = {}
+        self.waiting = {}
+        self.lock = threading.Lock()
+        atexit.register(self.flush_all)
+
+    # Function to record the profile content already stored
+    def mark_persisted(self, username, profile):
+        with self.lock:
+            self.persisted[username] = profile_hash(profile)
+
+    # Function to schedule a debounced write, skipping profiles that match what is stored
+    def schedule(self, username, profile):
+        digest = profile_hash(profile)
+        with self.lock:
+            timer = self.timers.pop(username, None)
+            if timer:
+                timer.cancel()
+            if self.persisted.get(username) == digest:
+                self.waiting.pop(username, None)
+                return
+            self.waiting[username] = copy.deepcopy(profile)
+            timer = threading.Timer(self.debounce_seconds, self.flush, args=(username,))
+            timer.daemon = True
+            self.timers[username] = timer
+            timer.start()
+
+    # Function to write the latest waiting profile for a user right away
+    def flush(self, username):
+        with self.lock:
+            timer = self.timers.pop(username, None)
+            if timer:
+                timer.cancel()
+            profile = self.waiting.pop(username, None)
+        if profile is None:
+            return
+        try:
+            # Background writers have no page to report to, so errors go to the log
+            get_storage().save_profile(username, profile)
+            self.mark_persisted(username, profile)
+        except Exception as e:
+            logger.warning("Failed to save profile for %s: %s", username, e)
+
+    # Function to write every waiting profile, used at interpreter exit
+    def flush_all(self):
+        with self.lock:
+            usernames = list(self.waiting)
+        for username in usernames:
+            self.flush(username)
+
+# Function to get the profile writer shared by every session in this process
+@st.cache_resource(show_spinner=False)
+def get_profile_writer():
+    return ProfileWriter()